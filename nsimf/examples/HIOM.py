@@ -1,3 +1,5 @@
+from collections import ChainMap
+
 import networkx as nx
 import numpy as np
 
@@ -5,6 +7,8 @@ from nsimf.models.Model import Model
 from nsimf.models.Model import ModelConfiguration
 from nsimf.models.Scheme import Scheme
 from nsimf.models.Update import Update
+from nsimf.models.Kernel import KernelUpdate
+from nsimf.models.Sampler import WeightedSampler
 from nsimf.models.Example import Example
 
 
@@ -16,7 +20,7 @@ class HIOM(Example):
         g = nx.watts_strogatz_graph(n, 2, 0.02)
         cfg = {
             'save_disk': False,
-            # 'path': './out.txt',
+            # 'path': './out.npy',
             # 'save_interval': 100,
             'state_memory': 0,
             'memory_interval': 1
@@ -48,20 +52,33 @@ class HIOM(Example):
             'A': 1
         }
 
-        def update_I_A(nodes, constants):
-            node = nodes[0]
-            nb = np.random.choice(self.model.get_neighbors(node))
-            if abs(self.model.get_node_state(node, 'O') - self.model.get_node_state(nb, 'O')) > constants['t_O']:
-                return {'I': self.model.get_node_state(node, 'I')}
-            else:
+        def update_I_A(nodes, states, new_states, indptr, indices, constants):
+            r_min = constants[0]
+            p = constants[1]
+            s_I = constants[2]
+            d_A = constants[3]
+            A_star = constants[4]
+            t_O = constants[5]
+            # Columns of the states
+            i_column = int(constants[6])
+            a_column = int(constants[7])
+            o_column = int(constants[8])
+            for node in nodes:
+                start = indptr[node]
+                degree = indptr[node + 1] - start
+                if degree == 0:
+                    continue
+                nb = indices[start + np.random.randint(degree)]
+                if abs(states[node, o_column] - states[nb, o_column]) > t_O:
+                    continue
                 # Update information
-                r = constants['r_min'] + (1 - constants['r_min']) / (1 + np.exp(-1 * constants['p'] * (self.model.get_node_state(node, 'O') - self.model.get_node_state(nb, 'O'))))
-                inf = r * self.model.get_node_state(node, 'I') + (1-r) * self.model.get_node_state(nb, 'I') + np.random.normal(0, constants['s_I'])
+                r = r_min + (1 - r_min) / (1 + np.exp(-1 * p * (states[node, o_column] - states[nb, o_column])))
+                new_states[node, i_column] = r * states[node, i_column] + (1 - r) * states[nb, i_column] \
+                    + np.random.normal(0, s_I)
 
                 # Update attention
-                node_A = self.model.get_node_state(node, 'A') + constants['d_A'] * (2 * constants['A_star'] - self.model.get_node_state(node, 'A'))
-                nb_A = self.model.get_node_state(nb, 'A') + constants['d_A'] * (2 * constants['A_star'] - self.model.get_node_state(nb, 'A'))
-                return {'I': [inf], 'A': {node: node_A, nb: nb_A}}
+                new_states[node, a_column] = states[node, a_column] + d_A * (2 * A_star - states[node, a_column])
+                new_states[nb, a_column] = states[nb, a_column] + d_A * (2 * A_star - states[nb, a_column])
 
         def update_A(constants):
             return {'A': self.model.get_state('A') - 2 * constants['d_A'] * self.model.get_state('A')/constants['N']}
@@ -77,23 +94,20 @@ class HIOM(Example):
         def shrink_A():
             return {'A': self.model.get_state('A') * 0.999}
 
-        def sample_attention_weighted(graph):
-            probs = []
-            A = self.model.get_state('A')
-            factor = 1.0/sum(A)
-            for a in A:
-                probs.append(a * factor)
-            return np.random.choice(graph.nodes, size=1, replace=False, p=probs)
-
         # Model definition
         self.model.constants = constants
         self.model.set_states(['I', 'A', 'O'])
+        columns = {state + '_column': self.model.get_state_index(state) for state in ['I', 'A', 'O']}
 
-        up_I_A = Update(update_I_A, {'constants': self.model.constants}, get_nodes=True)
+        # Node level update compiled with Numba when it is installed,
+        # the state columns are passed after the constants
+        up_I_A = KernelUpdate(update_I_A, ChainMap(self.model.constants, columns),
+                              names=['r_min', 'p', 's_I', 'd_A', 'A_star', 't_O', 'I_column', 'A_column', 'O_column'],
+                              writes=['I', 'A'])
         s_I = Update(shrink_I)
         s_A = Update(shrink_A)
 
-        self.model.add_scheme(Scheme(sample_attention_weighted, {'graph': self.model.graph}, updates=[up_I_A]))
+        self.model.add_scheme(Scheme(WeightedSampler(self.model, 'A'), updates=[up_I_A]))
         self.model.add_scheme(Scheme(lambda graph: graph.nodes, {'graph': self.model.graph}, lower_bound=5000, updates=[s_I]))
         self.model.add_scheme(Scheme(lambda graph: graph.nodes, {'graph': self.model.graph}, lower_bound=10000, updates=[s_A]))
         self.model.add_update(update_A, {'constants': self.model.constants})
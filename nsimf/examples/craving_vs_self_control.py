@@ -14,10 +14,12 @@ class CravingSelfControl(Example):
         g = nx.random_geometric_graph(250, 0.125)
         cfg = {
             'save_disk': False,
-            # 'path': './out.txt',
+            # 'path': './out.npy',
             # 'save_interval': 10,
             'state_memory': 0,
-            'memory_interval': 1
+            'memory_interval': 1,
+            'adjacency_format': 'csr',
+            'update_threads': 4
         }
         self.model = Model(g, ModelConfiguration(cfg))
 
@@ -74,9 +76,7 @@ class CravingSelfControl(Example):
         #     return {'E': np.maximum(-1.5, self.model.get_state('E') - e)} # Custom calculation
 
         def update_E(constants):
-            adj = self.model.get_adjacency()
-            summed = np.matmul(adj, self.model.get_nodes_states())
-            e = summed[:, self.model.get_state_index('A')] / 50
+            e = self.model.get_neighbors_sum('A') / 50
             return {'E': np.maximum(-1.5, self.model.get_state('E') - e)}
 
         def update_V(constants):
@@ -91,11 +91,12 @@ class CravingSelfControl(Example):
         # Model definition
         self.model.constants = constants
         self.model.set_states(['C', 'S', 'E', 'V', 'lambda', 'A'])
-        self.model.add_update(update_C, {'constants': self.model.constants})
-        self.model.add_update(update_S, {'constants': self.model.constants})
-        self.model.add_update(update_E, {'constants': self.model.constants})
-        self.model.add_update(update_V, {'constants': self.model.constants})
-        self.model.add_update(update_lambda, {'constants': self.model.constants})
+        # Updates declaring the states they read and write are executed concurrently
+        self.model.add_update(update_C, {'constants': self.model.constants}, reads=['C', 'A'], writes=['C'])
+        self.model.add_update(update_S, {'constants': self.model.constants}, reads=['S', 'C', 'A'], writes=['S'])
+        self.model.add_update(update_E, {'constants': self.model.constants}, reads=['E', 'A'], writes=['E'])
+        self.model.add_update(update_V, {'constants': self.model.constants}, reads=['C', 'S', 'E'], writes=['V'])
+        self.model.add_update(update_lambda, {'constants': self.model.constants}, reads=['lambda'], writes=['lambda'])
         self.model.add_update(update_A, {'constants': self.model.constants})
         self.model.set_initial_state(initial_state, {'constants': self.model.constants})
 
@@ -10,7 +10,7 @@ if __name__ == "__main__":
     model = ExampleRunner(m)
     output = model.simulate(100)
     model.visualize(output)
-    # # states = Visualizer.read_states_from_file('./out.txt')
+    # # states = Visualizer.read_states_from_file('./out.npy')
     # # model.visualize(states)
 
     print('Running HIOM model')
@@ -18,5 +18,5 @@ if __name__ == "__main__":
     model = ExampleRunner(m)
     output = model.simulate(15000)
     model.visualize(output)
-    # states = Visualizer.read_states_from_file('./out.txt')
+    # states = Visualizer.read_states_from_file('./out.npy')
     # model.visualize(states)
\ No newline at end of file
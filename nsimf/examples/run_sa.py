@@ -1,4 +1,5 @@
 from nsimf.models.Model import Model
+from nsimf.models.Model import ModelConfiguration
 from nsimf.models.SA import SensitivityAnalysis
 from nsimf.models.SA import SAConfiguration
 
@@ -12,7 +13,7 @@ __email__ = "m.f.maijer@gmail.com"
 
 if __name__ == "__main__":
     g = nx.random_geometric_graph(200, 0.125)
-    model = Model(g)
+    model = Model(g, ModelConfiguration({'adjacency_format': 'csr'}))
 
     constants = {
         'q': 0.8,
@@ -24,10 +25,11 @@ if __name__ == "__main__":
     }
     constants['p'] = 2*constants['d']
 
-    def initial_v(constants):
+    # Updates receive the model as an argument, so they run on the clones made by the analysis
+    def initial_v(model, constants):
         return np.minimum(1, np.maximum(0, model.get_state('C') - model.get_state('S') - model.get_state('E')))
 
-    def initial_a(constants):
+    def initial_a(model, constants):
         return constants['q'] * model.get_state('V') + (np.random.poisson(model.get_state('lambda'))/7)
 
     initial_state = {
@@ -39,49 +41,43 @@ if __name__ == "__main__":
         'A': initial_a
     }
 
-    def update_C(constants):
+    def update_C(model, constants):
         c = model.get_state('C') + constants['b'] * model.get_state('A') * np.minimum(1, 1-model.get_state('C')) - constants['d'] * model.get_state('C')
         return {'C': c}
 
-    def update_S(constants):
+    def update_S(model, constants):
         return {'S': model.get_state('S') + constants['p'] * np.maximum(0, constants['S+'] - model.get_state('S')) - constants['h'] * model.get_state('C') - constants['k'] * model.get_state('A')}
 
-    def update_E(constants):
-        # return {'E': model.get_state('E') - 0.015}
-        e = np.zeros(len(model.nodes))
-        for i, node in enumerate(model.nodes):
-            neighbor_addiction = 0
-            for neighbor in model.get_neighbors(node):
-                neighbor_addiction += model.get_node_state(neighbor, 'A')
-            e[i] = neighbor_addiction / 50
-        return {'E': np.maximum(-1.5, model.get_state('E') - e)} # Custom calculation
-
-    def update_V(constants):
+    def update_E(model, constants):
+        e = model.get_neighbors_sum('A') / 50
+        return {'E': np.maximum(-1.5, model.get_state('E') - e)}
+
+    def update_V(model, constants):
         return {'V': np.minimum(1, np.maximum(0, model.get_state('C')-model.get_state('S')-model.get_state('E')))}
 
-    def update_lambda(constants):
+    def update_lambda(model, constants):
         return {'lambda': model.get_state('lambda') + 0.01}
 
-    def update_A(constants):
+    def update_A(model, constants):
         return {'A': constants['q'] * model.get_state('V') + np.minimum((np.random.poisson(model.get_state('lambda'))/7), constants['q']*(1 - model.get_state('V')))}
 
     # Model definition
     model.constants = constants
     model.set_states(['C', 'S', 'E', 'V', 'lambda', 'A'])
-    model.add_update(update_C, {'constants': model.constants})
-    model.add_update(update_S, {'constants': model.constants})
-    model.add_update(update_E, {'constants': model.constants})
-    model.add_update(update_V, {'constants': model.constants})
-    model.add_update(update_lambda, {'constants': model.constants})
-    model.add_update(update_A, {'constants': model.constants})
-    # model.set_initial_state(initial_state, {'constants': model.constants})
+    model.add_update(update_C, {'model': model, 'constants': model.constants})
+    model.add_update(update_S, {'model': model, 'constants': model.constants})
+    model.add_update(update_E, {'model': model, 'constants': model.constants})
+    model.add_update(update_V, {'model': model, 'constants': model.constants})
+    model.add_update(update_lambda, {'model': model, 'constants': model.constants})
+    model.add_update(update_A, {'model': model, 'constants': model.constants})
+    # model.set_initial_state(initial_state, {'model': model, 'constants': model.constants})
 
     cfg = SAConfiguration(
         {
             'bounds': {'q': (0.79, 0.81), 'b': (0.49, 0.51), 'd': (0.19, 0.21)},
             'iterations': 100,
             'initial_state': initial_state,
-            'initial_args': {'constants': model.constants},
+            'initial_args': {'model': model, 'constants': model.constants},
             'n': 2,
             'second_order': True,
 
@@ -89,6 +85,9 @@ if __name__ == "__main__":
             'algorithm': average_clustering,
             'output_type': 'reduce',
             'algorithm_args': {},
+
+            'processes': 4,
+            'seed': 1337,
         }
     )
     sa = SensitivityAnalysis(cfg, model)
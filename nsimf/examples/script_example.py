@@ -15,7 +15,7 @@ if __name__ == "__main__":
     g = nx.random_geometric_graph(250, 0.125)
     cfg = {
         'save_disk': False,
-        # 'path': './out.txt',
+        # 'path': './out.npy',
         # 'save_interval': 10,
         'state_memory': 0,
         'memory_interval': 1
@@ -55,9 +55,7 @@ if __name__ == "__main__":
         return {'S': model.get_state('S') + constants['p'] * np.maximum(0, constants['S+'] - model.get_state('S')) - constants['h'] * model.get_state('C') - constants['k'] * model.get_state('A')}
 
     def update_E(constants):
-        adj = model.get_adjacency()
-        summed = np.matmul(adj, model.get_nodes_states())
-        e = summed[:, model.get_state_index('A')] / 50
+        e = model.get_neighbors_sum('A') / 50
         return {'E': np.maximum(-1.5, model.get_state('E') - e)}
 
     def update_V(constants):
@@ -1,8 +1,94 @@
+import networkx as nx
+import numpy as np
+import scipy.sparse as sp
+
 from nsimf.models.Model import Model
+from nsimf.models.NetworkMutations import edge_keys
+from nsimf.models.Scheme import Scheme
 
 __author__ = "Mathijs Maijer"
 __email__ = "m.f.maijer@gmail.com"
 
 
 class ArrayModel(Model):
-    pass
+    """
+    Model without a networkx graph, the network is given as a dense or scipy sparse adjacency matrix
+    and the nodes are the contiguous integers 0..N-1.
+    A networkx graph is only created on request, for example to visualize the model.
+    The adjacency matrix is stored in CSR format unless another format is configured
+    """
+    default_adjacency_format = 'csr'
+
+    def __init__(self, adjacency, config=None, seed=None, directed=False):
+        self.adjacency = adjacency
+        self.directed = directed
+        self.removed_nodes = np.array([], dtype=np.int64)
+        super(ArrayModel, self).__init__(None, config, seed)
+
+    @classmethod
+    def from_edges(cls, sources, targets, n_nodes=None, weights=None, config=None, seed=None, directed=False):
+        """
+        Create a model from arrays of edge sources and targets,
+        undirected edges only have to be given in one direction
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        if n_nodes is None:
+            n_nodes = int(max(sources.max(initial=-1), targets.max(initial=-1))) + 1
+        weights = np.broadcast_to(np.asarray(1. if weights is None else weights, dtype=float), sources.shape)
+        if not directed:
+            sources, targets = np.concatenate((sources, targets)), np.concatenate((targets, sources))
+            weights = np.concatenate((weights, weights))
+        # The last weight of a repeated edge is kept
+        _, last = np.unique(edge_keys(sources, targets, n_nodes)[::-1], return_index=True)
+        last = len(sources) - 1 - last
+        adjacency = sp.csr_array((weights[last], (sources[last], targets[last])), shape=(n_nodes, n_nodes))
+        return cls(adjacency, config, seed, directed)
+
+    @classmethod
+    def from_networkx(cls, graph, config=None, seed=None):
+        return cls(nx.convert_matrix.to_scipy_sparse_array(graph, format='csr'), config, seed, graph.is_directed())
+
+    @property
+    def nodes(self):
+        return self.node_range
+
+    def get_graph(self):
+        """
+        Create a networkx graph of the current network
+        """
+        graph = nx.from_scipy_sparse_array(sp.csr_array(self.adjacency),
+                                           create_using=nx.DiGraph if self.directed else nx.Graph)
+        graph.remove_nodes_from(self.removed_nodes.tolist())
+        return graph
+
+    def is_directed(self):
+        return self.directed
+
+    def get_ordered_nodes(self):
+        return self.node_range if len(self.removed_nodes) == 0 else None
+
+    def update_adjacency(self):
+        """
+        Convert the adjacency matrix to the configured format and rebuild the neighbor index
+        """
+        if self.get_adjacency_format() == 'dense':
+            self.adjacency = self.adjacency.toarray() if sp.issparse(self.adjacency) else np.asarray(self.adjacency)
+        else:
+            self.adjacency = sp.csr_array(self.adjacency).asformat(self.get_adjacency_format())
+        self.update_neighbor_index()
+
+    def update_neighbor_index(self):
+        super(ArrayModel, self).update_neighbor_index()
+        self.node_range = np.arange(self.get_n_nodes())
+        if len(self.removed_nodes):
+            self.node_range = np.setdiff1d(self.node_range, self.removed_nodes, assume_unique=True)
+
+    def apply_mutations(self):
+        if self.mutations.removed_nodes:
+            self.removed_nodes = np.union1d(self.removed_nodes, np.concatenate(self.mutations.removed_nodes))
+        super(ArrayModel, self).apply_mutations()
+
+    def clear(self):
+        super(ArrayModel, self).clear()
+        self.schemes[0] = Scheme(lambda model: model.nodes, {'model': self}, lower_bound=0)
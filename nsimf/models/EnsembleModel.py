@@ -0,0 +1,70 @@
+import numpy as np
+
+from nsimf.models.Model import Model
+from nsimf.models.Sampler import WeightedSampler
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+class EnsembleModel(Model):
+    """
+    Model that simulates a number of replicas at once,
+    the node states are stored in a single (replicas, nodes, states) array.
+
+    State getters return arrays with a leading replica axis and constants given as a sequence
+    with a value per replica are stored as (replicas, 1) arrays, so vectorized update functions
+    advance all replicas with the same numpy operations.
+
+    Random values drawn with a value per node, such as np.random.random(n_nodes), are broadcast to all replicas,
+    so every replica gets the same noise. Initial states and updates should draw their random values
+    in the shape of get_state_shape(), (replicas, nodes), to make the replicas independent runs.
+    Kernels run once per replica, see KernelUpdate. Schemes sample the same nodes for all replicas,
+    so samplers weighted by a state are not supported
+    """
+    def __init__(self, graph, replicas, config=None, seed=None):
+        self.replicas = replicas
+        super(EnsembleModel, self).__init__(graph, config, seed)
+
+    @property
+    def constants(self):
+        return Model.constants.fget(self)
+
+    @constants.setter
+    def constants(self, constants):
+        Model.constants.fset(self, {name: self.replicate(value) for name, value in constants.items()})
+
+    def replicate(self, value):
+        """
+        Convert a sequence of values per replica to a (replicas, 1) array,
+        other values are shared by all replicas
+        """
+        if isinstance(value, (list, tuple, np.ndarray)) and np.ndim(value) == 1 and len(value) == self.replicas:
+            return np.asarray(value).reshape((self.replicas, 1))
+        return value
+
+    def set_states(self, states):
+        super(EnsembleModel, self).set_states(states)
+        self.node_states = self.allocate_states((self.replicas,) + self.node_states.shape)
+
+    def add_update(self, fun, args=None, condition=None, get_nodes=False, reads=None, writes=None):
+        if condition:
+            raise ValueError('Conditions are not supported for ensemble models')
+        super(EnsembleModel, self).add_update(fun, args, condition, get_nodes, reads, writes)
+
+    def add_kernel(self, fun, constants=None, condition=None, jit=True, names=None, writes=None):
+        if condition:
+            raise ValueError('Conditions are not supported for ensemble models')
+        return super(EnsembleModel, self).add_kernel(fun, constants, condition, jit, names, writes)
+
+    def add_scheme(self, scheme):
+        if isinstance(scheme.sample_function, WeightedSampler):
+            raise ValueError('Weighted samplers are not supported for ensemble models')
+        super(EnsembleModel, self).add_scheme(scheme)
+
+    def get_replica(self, replica):
+        return self.node_states[replica]
+
+    def reset(self):
+        super(EnsembleModel, self).reset()
+        self.node_states = self.allocate_states((self.replicas,) + self.node_states.shape)
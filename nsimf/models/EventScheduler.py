@@ -0,0 +1,181 @@
+import numpy as np
+import tqdm
+
+from nsimf.models.FenwickTree import FenwickTree
+from nsimf.models.Sampler import NodeSampler
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+class NodeEvent(object):
+    """
+    Event that applies an update to a single node.
+    The rate of every node is a number, the name of a state holding the rates,
+    or a function receiving an array of nodes and returning their rates.
+    Rate functions may depend on neighbor states, so the rates of the neighbors of changed nodes are recomputed too
+    """
+    def __init__(self, update, rate):
+        self.update = update
+        self.rate = rate
+        self.tree = None
+
+    @property
+    def total(self):
+        return self.tree.total
+
+    def rates(self, model, nodes):
+        if callable(self.rate):
+            return np.asarray(self.rate(nodes), dtype=float)
+        elif isinstance(self.rate, str):
+            return model.get_nodes_state(nodes, self.rate)
+        return np.full(len(nodes), float(self.rate))
+
+    def build(self, model):
+        self.tree = FenwickTree(self.rates(model, np.arange(model.get_n_nodes())))
+
+    def refresh(self, model, nodes):
+        if nodes is None:
+            self.build(model)
+            return
+        if callable(self.rate) and len(nodes):
+            index = model.get_neighbor_index()
+            nodes = np.unique(np.concatenate([nodes] + [index.neighbors(node) for node in nodes]))
+        elif not callable(self.rate) and not isinstance(self.rate, str):
+            return
+        for node, rate in zip(nodes, self.rates(model, nodes)):
+            self.tree.update(node, rate)
+
+    def fire(self, model):
+        nodes = self.tree.sample()
+        if self.update.condition:
+            nodes = model.valid_update_condition_nodes(self.update, nodes)
+            if len(nodes) == 0:
+                return nodes
+        return model.apply_update(self.update, nodes)
+
+
+class SchemeEvent(object):
+    """
+    Event that executes all updates of a scheme at a fixed rate
+    """
+    def __init__(self, scheme, rate):
+        self.scheme = scheme
+        self.total = float(rate)
+
+    def build(self, model):
+        pass
+
+    def refresh(self, model, nodes):
+        pass
+
+    def fire(self, model):
+        scheme_nodes = self.scheme.sample()
+        for update in self.scheme.updates:
+            nodes = model.valid_update_condition_nodes(update, scheme_nodes)
+            if len(nodes):
+                model.apply_update(update, nodes)
+        # Every node may have changed
+        return None
+
+
+class EventScheduler(object):
+    """
+    Continuous-time, event-driven (Gillespie) simulation engine for a model.
+    The next event is picked proportional to its rate, by tower sampling the event totals
+    and a Fenwick tree over the node rates of the chosen event.
+    Events update the node states in place and only the rates of the changed nodes are recomputed.
+
+    The states are observed every interval time units, a snapshot. The intervals of the configuration
+    (save_interval, memory_interval) and the iteration_interval of the property functions count snapshots,
+    so an iteration_interval of 2 evaluates a property every 2 * interval time units.
+    The current_iteration of the model counts the fired events
+    """
+    def __init__(self, model):
+        self.model = model
+        self.events = []
+        self.time = 0.
+        self.snapshots = 0
+
+    def add_node_event(self, update, rate):
+        if not update.get_nodes:
+            raise ValueError('Node events require updates that receive their nodes')
+        self.events.append(NodeEvent(update, rate))
+
+    def add_scheme_event(self, scheme, rate):
+        self.events.append(SchemeEvent(scheme, rate))
+
+    def simulate(self, t, interval, show_tqdm=True):
+        """
+        Simulate for t time units, taking a snapshot of the states every interval time units
+        """
+        model = self.model
+        n = int(np.floor(t / interval + 1e-9))
+        model.apply_mutations()
+        model.allocate_history(model.count_snapshots(n, model.config.memory_interval, self.snapshots))
+        for prop in model.property_functions:
+            # Properties are calculated before the snapshot counter is incremented
+            prop.allocate(model.count_snapshots(n, prop.iteration_interval, self.snapshots - 1))
+        with model.open_writer(n, self.snapshots) as writer:
+            self.run(t, interval, n, writer, show_tqdm)
+        return model.simulation_output
+
+    def run(self, t, interval, n, writer, show_tqdm):
+        model = self.model
+        for event in self.events:
+            event.build(model)
+        # Node samplers of the scheme events and incremental properties are told which nodes the events changed
+        observers = [event.scheme.sample_function for event in self.events if isinstance(event, SchemeEvent)
+                     and isinstance(event.scheme.sample_function, NodeSampler)]
+        observers += [prop for prop in model.property_functions if prop.incremental]
+
+        end = self.time + t
+        next_snapshot = self.time + interval
+        saved = 0
+        progress = tqdm.tqdm(total=n) if show_tqdm else None
+        try:
+            while True:
+                totals = np.array([event.total for event in self.events])
+                total = totals.sum()
+                step = np.random.exponential(1 / total) if total > 0 else np.inf
+                while saved < n and next_snapshot <= min(self.time + step, end):
+                    self.snapshot(writer)
+                    saved += 1
+                    next_snapshot += interval
+                    if progress:
+                        progress.update(1)
+                if self.time + step > end:
+                    self.time = end
+                    break
+                self.time += step
+                index = np.searchsorted(np.cumsum(totals), np.random.random() * total, side='right')
+                event = self.events[min(index, len(self.events) - 1)]
+                changed = event.fire(model)
+                if len(model.mutations):
+                    # The network changed, so all rates are rebuilt
+                    model.apply_mutations()
+                    changed = None
+                if observers:
+                    written = {column: None if changed is None else [changed] for column in model.state_map.values()}
+                    for observer in observers:
+                        observer.states_written(written)
+                for other in self.events:
+                    other.refresh(model, changed)
+                model.current_iteration += 1
+        finally:
+            if progress:
+                progress.close()
+
+    def snapshot(self, writer):
+        """
+        Evaluate the properties due and save and publish the current states
+        """
+        model = self.model
+        model.calculate_properties(self.snapshots)
+        self.snapshots += 1
+        if writer and self.snapshots % model.config.save_interval == 0:
+            writer.write(model.node_states)
+        if model.config.state_memory != -1 and self.snapshots % model.config.memory_interval == 0:
+            model.history.append(model.node_states)
+        if model.shared:
+            model.shared.publish(model.node_states, model.current_iteration, model.history)
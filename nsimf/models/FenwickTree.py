@@ -0,0 +1,68 @@
+import numpy as np
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+class FenwickTree(object):
+    """
+    Fenwick (binary indexed) tree over non-negative weights,
+    supporting O(log N) weight updates and weight-proportional sampling
+    """
+    def __init__(self, weights):
+        self.build(weights)
+
+    def build(self, weights):
+        """
+        Build the tree from scratch in O(N) with vectorized prefix sums
+        """
+        self.weights = np.array(weights, dtype=float)
+        if (self.weights < 0).any():
+            raise ValueError('Weights should be non-negative')
+        self.size = len(self.weights)
+        prefix = np.concatenate(([0.], np.cumsum(self.weights)))
+        i = np.arange(1, self.size + 1)
+        self.tree = np.zeros(self.size + 1)
+        self.tree[1:] = prefix[i] - prefix[i - (i & -i)]
+        self.total = prefix[-1]
+        self.top = 1 << (self.size.bit_length() - 1) if self.size else 0
+
+    def update(self, index, weight):
+        if weight < 0:
+            raise ValueError('Weights should be non-negative')
+        delta = weight - self.weights[index]
+        self.weights[index] = weight
+        self.total += delta
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix_sum(self, index):
+        """
+        Sum of the weights up to and including index
+        """
+        total = 0.
+        i = index + 1
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def find(self, value):
+        """
+        Find the first index at which the prefix sum exceeds value
+        """
+        position = 0
+        step = self.top
+        while step:
+            if position + step <= self.size and self.tree[position + step] <= value:
+                position += step
+                value -= self.tree[position]
+            step >>= 1
+        return min(position, self.size - 1)
+
+    def sample(self, size=1):
+        if self.total <= 0:
+            raise ValueError('Can not sample from weights that sum to zero')
+        return np.array([self.find(value) for value in np.random.random(size) * self.total], dtype=np.int64)
@@ -0,0 +1,89 @@
+import numpy as np
+
+from nsimf.models.Update import Update
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+seed_numba = None
+
+
+def seed_kernels(seed):
+    """
+    Seed the random state of compiled kernels,
+    Numba keeps its own random state that is not seeded by np.random.seed outside of compiled code
+    """
+    global seed_numba
+    if numba is None or seed is None:
+        return
+    if seed_numba is None:
+        def seed_random(value):
+            np.random.seed(value)
+        seed_numba = numba.njit(cache=False)(seed_random)
+    seed_numba(seed)
+
+
+def compile_kernel(function, jit=True):
+    """
+    Compile a kernel function with Numba when it is installed,
+    otherwise the function is returned as is and runs as pure Python
+    """
+    if jit and numba is not None:
+        return numba.njit(cache=False)(function)
+    return function
+
+
+class KernelUpdate(Update):
+    """
+    Update defined as a plain numeric kernel over state arrays.
+    The kernel is called as function(nodes, states, new_states, indptr, indices, constants), where
+    states are the current node states, new_states the buffer the next states are written to in place,
+    indptr and indices the CSR neighbor index and constants an array of the given constants' values
+    in the order of their keys, or of the given names.
+    Reading new_states lets every node see the updates of the nodes before it,
+    giving asynchronous agent-style updates.
+    writes optionally declares the states the kernel writes. Kernels can write any node,
+    so observers of the update plan, like weighted samplers, see all nodes of these states as written,
+    and all states when writes is not declared.
+
+    Kernels are compiled with Numba when it is installed. Numba keeps its own random state,
+    it is seeded with the seed of the model, see seed_kernels.
+    States with a leading replica axis, as those of ensemble models, run the kernel once per replica
+    with the (nodes, states) arrays and the constants of that replica
+    """
+
+    def __init__(self, fun, constants=None, condition=None, jit=True, names=None, writes=None):
+        super(KernelUpdate, self).__init__(fun, {'constants': constants if constants else {}}, condition, True,
+                                           writes=writes)
+        self.constant_names = list(names) if names else list(self.arguments['constants'].keys())
+        self.kernel = compile_kernel(fun, jit)
+
+    @property
+    def compiled(self):
+        return self.kernel is not self.function
+
+    def get_constants(self, replica=None):
+        constants = self.arguments['constants']
+        values = [constants[name] for name in self.constant_names]
+        if replica is not None:
+            # Constants with a value per replica are (replicas, 1) arrays
+            values = [np.ravel(value)[replica] if np.ndim(value) else value for value in values]
+        return np.array(values, dtype=float)
+
+    def execute_kernel(self, nodes, states, new_states, neighbor_index):
+        nodes = np.asarray(nodes, dtype=np.int64)
+        if states.ndim > 2:
+            for replica in range(states.shape[0]):
+                self.kernel(nodes, states[replica], new_states[replica],
+                            neighbor_index.indptr, neighbor_index.indices, self.get_constants(replica))
+            return
+        self.kernel(nodes, states, new_states, neighbor_index.indptr, neighbor_index.indices, self.get_constants())
+
+    def execute(self, nodes=None):
+        raise ValueError('Kernel updates write states in place and are executed by the update plan')
@@ -1,11 +1,28 @@
 from abc import ABCMeta
-import tqdm
+from contextlib import contextmanager
 import copy
+import tqdm
 import numpy as np
 import networkx as nx
-
+import scipy.sparse as sp
+
+from nsimf.models.Kernel import KernelUpdate
+from nsimf.models.Kernel import seed_kernels
+from nsimf.models.NeighborIndex import NeighborIndex
+from nsimf.models.NetworkMutations import NetworkMutations
+from nsimf.models.NetworkMutations import resize_rows
+from nsimf.models.PartitionedPlan import PartitionedPlan
 from nsimf.models.Update import Update
+from nsimf.models.UpdatePlan import UpdatePlan
+from nsimf.models.UpdatePlan import write_output
+from nsimf.models.UpdatePlan import changed_nodes
+from nsimf.models.Sampler import NodeSampler
+from nsimf.models.SharedStates import SharedStates
 from nsimf.models.Scheme import Scheme
+from nsimf.models.StateHistory import StateHistory
+from nsimf.models.StateWriter import StateWriter
+from nsimf.models.StateWriter import AsyncStateWriter
+from nsimf.models.UtilityLayer import UtilityLayer
 from nsimf.models.Visualizer import VisualizationConfiguration
 from nsimf.models.Visualizer import Visualizer
 
@@ -15,34 +32,83 @@ __author__ = "Mathijs Maijer"
 __email__ = "m.f.maijer@gmail.com"
 
 
+def refers_to(function, obj):
+    """
+    Whether a function refers to an object, or to an object holding it as an attribute,
+    through its closure or the globals it uses
+    """
+    code = getattr(function, '__code__', None)
+    if code is None:
+        return False
+    values = []
+    for cell in function.__closure__ or ():
+        try:
+            values.append(cell.cell_contents)
+        except ValueError:
+            pass
+    values += [function.__globals__[name] for name in code.co_names if name in function.__globals__]
+    return any(value is obj or any(attribute is obj for attribute in getattr(value, '__dict__', {}).values())
+               for value in values)
+
+
 class ConfigurationException(Exception):
     """Configuration Exception"""
 
 
 class ModelConfiguration(object):
     """
-    Configuration for the visualizer
+    Configuration for the model
+
+    adjacency_format selects how the adjacency matrix is stored:
+    'dense' for a numpy array, 'csr' or 'csc' for a scipy sparse matrix,
+    by default graph models use 'dense' and array models 'csr'.
+    With async_io states saved to disk are written by a background thread,
+    io_queue_size bounds the number of snapshots waiting to be written.
+    update_threads sets the number of threads independent updates are executed on.
+    With more than one process the nodes are partitioned over forked worker processes,
+    see PartitionedPlan.
+    With shared_memory the node states and history are allocated in shared memory,
+    other processes can attach to them with the handle of get_shared_handle
     TODO: Validate attributes
     """
+    adjacency_formats = ['dense', 'csr', 'csc']
+
     def __init__(self, iterable=(), **kwargs):
+        self.save_disk = False
+        self.state_memory = 0
+        self.memory_interval = 1
+        self.adjacency_format = None
+        self.async_io = False
+        self.io_queue_size = 4
+        self.update_threads = 1
+        self.processes = 1
+        self.shared_memory = False
         self.__dict__.update(iterable, **kwargs)
         self.validate()
 
     def validate(self):
-        pass
+        if self.adjacency_format is not None and self.adjacency_format not in self.adjacency_formats:
+            raise ConfigurationException(
+                'Adjacency format should be one of ' + ', '.join(self.adjacency_formats))
 
 
 class Model(object, metaclass=ABCMeta):
     """
     Partial Abstract Class defining a model
     """
+    default_adjacency_format = 'dense'
 
     def __init__(self, graph, config=None, seed=None):
         self.graph = graph
-        self.config = config
+        self.config = config if config else ModelConfiguration()
+        self.utility = None
+        self.shared = None
+        self.plan = None
+        self.mutations = NetworkMutations()
         self.update_adjacency()
         self.clear()
         np.random.seed(seed)
+        seed_kernels(seed)
 
     @property
     def constants(self):
@@ -56,119 +122,406 @@ class Model(object, metaclass=ABCMeta):
     def nodes(self):
         return list(self.graph.nodes())
 
+    def get_n_nodes(self):
+        return self.neighbor_index.n_nodes
+
+    def get_graph(self):
+        return self.graph
+
+    def is_directed(self):
+        return self.graph.is_directed()
+
+    def get_ordered_nodes(self):
+        """
+        The nodes sampled by the default scheme if they are exactly 0..N-1 in order, otherwise None
+        """
+        nodes = self.graph.nodes
+        return nodes if list(nodes) == list(range(self.get_n_nodes())) else None
+
     def add_property_function(self, fun):
         self.property_functions.append(fun)
+        # The plan reports written nodes to incremental property functions
+        self.invalidate_plan()
 
     def set_states(self, states):
-        self.node_states = np.zeros((len(self.graph.nodes()), len(states)))
+        self.invalidate_plan()
         self.state_names = states
         for i, state in enumerate(states):
             self.state_map[state] = i
+        self.node_states = self.allocate_states((self.get_n_nodes(), len(states)))
+
+    def allocate_states(self, shape):
+        """
+        Allocate zeroed node states, in shared memory when it is configured
+        """
+        if not self.config.shared_memory:
+            return np.zeros(shape)
+        if self.shared:
+            self.shared.close()
+        self.shared = SharedStates(shape, float, self.state_map)
+        self.next_states = self.shared.buffers[1]
+        return self.shared.buffers[0]
+
+    def get_shared_handle(self):
+        """
+        Handle to attach to the shared node states and history from other processes with SharedStatesReader
+        """
+        if not self.shared:
+            raise ValueError('The node states are not in shared memory, enable shared_memory in the configuration')
+        return self.shared.handle
+
+    def release_shared_memory(self):
+        """
+        Move the node states and history to private memory and free the shared memory
+        """
+        if not self.shared:
+            return
+        self.node_states, self.next_states = np.array(self.node_states), np.array([])
+        self.history.buffer = np.array(self.history.buffer)
+        self.shared.close()
+        self.shared = None
 
     def set_initial_state(self, initial_state, args=None):
         arguments = args if args else {}
+        # Samplers are rebuilt from the new states and incremental properties recomputed
+        for scheme in self.schemes:
+            if isinstance(scheme.sample_function, NodeSampler):
+                scheme.sample_function.reset()
+        for prop in self.property_functions:
+            prop.invalidate()
         for state in initial_state.keys():
             val = initial_state[state]
             if hasattr(val, '__call__'):
-                self.node_states[:, self.state_map[state]] = val(**arguments)
+                self.node_states[..., self.state_map[state]] = val(**arguments)
             else:
-                self.node_states[:, self.state_map[state]] = val
+                self.node_states[..., self.state_map[state]] = val
 
     def get_state_index(self, state):
         return self.state_map[state]
 
     def get_state(self, state):
-        return self.node_states[:, self.state_map[state]]
+        return self.node_states[..., self.state_map[state]]
+
+    def get_state_shape(self):
+        """
+        Shape of the values of a single state, random values drawn in this shape are independent per replica
+        """
+        return self.node_states.shape[:-1]
 
     def get_node_states(self, node):
-        return self.node_states[node]
+        return self.node_states[..., node, :]
 
     def get_node_state(self, node, state):
-        return self.node_states[node, self.state_map[state]]
+        return self.node_states[..., node, self.state_map[state]]
 
     def get_nodes_state(self, nodes, state):
-        return self.node_states[nodes, self.state_map[state]]
+        return self.node_states[..., nodes, self.state_map[state]]
 
     def get_nodes_states(self):
+        """
+        The current node states, this buffer is reused for the states of two iterations later,
+        so it should be copied when it is kept during a simulation
+        """
         return self.node_states
 
     def get_previous_nodes_states(self, n):
         """
         Get all the nodes' states from the n'th previous saved iteration
         """
-        return self.simulation_output[-n - 1]
+        return self.history.get_previous(n)
 
-    def add_update(self, fun, args=None, condition=None, get_nodes=False):
+    def add_update(self, fun, args=None, condition=None, get_nodes=False, reads=None, writes=None):
         arguments = args if args else {}
-        if condition and condition.state:
-            condition.set_state_index(self.state_map[condition.state])
-        update = Update(fun, arguments, condition, get_nodes)
+        if condition:
+            condition.set_state_indices(self.state_map)
+        update = Update(fun, arguments, condition, get_nodes, reads, writes)
         self.schemes[0].add_update(update)
+        self.invalidate_plan()
+
+    def add_kernel(self, fun, constants=None, condition=None, jit=True, names=None, writes=None):
+        """
+        Add a kernel update, see KernelUpdate for the kernel signature
+        """
+        if condition:
+            condition.set_state_indices(self.state_map)
+        update = KernelUpdate(fun, constants, condition, jit, names, writes)
+        self.schemes[0].add_update(update)
+        self.invalidate_plan()
+        return update
 
     def add_scheme(self, scheme):
         self.schemes.append(scheme)
+        self.invalidate_plan()
+
+    def invalidate_plan(self):
+        """
+        Close the update plan, stopping its threads and worker processes, so it is recompiled when it is needed
+        """
+        if self.plan:
+            self.plan.close()
+        self.plan = None
+
+    def compile(self):
+        """
+        Compile the schemes, updates and conditions into a fixed update plan,
+        the plan is recompiled when updates or schemes are added
+        """
+        if self.plan:
+            self.plan.close()
+        if self.config.processes > 1:
+            self.plan = PartitionedPlan(self, self.config.processes)
+        else:
+            self.plan = UpdatePlan(self)
+        return self.plan
 
     def get_adjacency(self):
         return self.adjacency
 
+    def get_adjacency_format(self):
+        """
+        Configured format of the adjacency matrix, or the default of the model
+        """
+        return self.config.adjacency_format or self.default_adjacency_format
+
     def update_adjacency(self):
-        self.adjacency = nx.convert_matrix.to_numpy_array(self.graph)
+        """
+        Rebuild the adjacency matrix and neighbor index,
+        should be called whenever the graph changes
+        """
+        if self.get_adjacency_format() == 'dense':
+            self.adjacency = nx.convert_matrix.to_numpy_array(self.graph)
+        else:
+            self.adjacency = nx.convert_matrix.to_scipy_sparse_array(self.graph, format=self.get_adjacency_format())
+        self.update_neighbor_index()
+
+    def update_neighbor_index(self):
+        """
+        Rebuild the neighbor index from the adjacency matrix and realign the utility layer with it
+        """
+        self.neighbor_index = NeighborIndex(self.adjacency)
+        if self.utility:
+            self.utility.realign(self.neighbor_index)
+
+    def has_sparse_adjacency(self):
+        return sp.issparse(self.adjacency)
+
+    def get_neighbor_index(self):
+        return self.neighbor_index
 
     def get_all_neighbors(self):
-        neighbors = []
-        for node in list(self.graph.nodes()):
-            neighbors.append(self.get_neighbors(node))
-        return neighbors
+        return self.neighbor_index.all_neighbors()
 
     def get_neighbors(self, node):
-        return list(self.graph.neighbors(node))
+        return self.neighbor_index.neighbors(node)
+
+    def sample_neighbors(self, nodes=None, mask=False):
+        """
+        Sample one random neighbor for every given node, or for all nodes,
+        see NeighborIndex.sample for nodes without neighbors
+        """
+        return self.neighbor_index.sample(nodes, mask)
+
+    def get_neighbors_sum(self, state):
+        """
+        Sum the given state over the neighbors of every node,
+        weighted by the adjacency matrix, as a single matrix-vector product
+        """
+        return self.neighbor_index.sum(self.get_state(state))
+
+    def get_neighbors_mean(self, state):
+        return self.neighbor_index.mean(self.get_state(state))
+
+    def add_utility_layer(self, initial=None):
+        """
+        Add a utility value to every edge, see UtilityLayer for the initial utility formats
+        """
+        self.utility = UtilityLayer(self.neighbor_index, initial, self.is_directed())
+        return self.utility
+
+    def get_utility_layer(self):
+        return self.utility
+
+    def get_utility(self):
+        """
+        Sparse NxN matrix of the edge utilities, or None without a utility layer
+        """
+        return self.utility.matrix if self.utility else None
+
+    def add_nodes(self, n, states=None):
+        """
+        Queue n new nodes, optionally with a dict of their initial state values, and return their ids.
+        Mutations are batched and applied at the end of the iteration, or by calling apply_mutations
+        """
+        if self.config.save_disk or self.shared:
+            raise ValueError('Nodes can not be added while saving states to disk or in shared memory')
+        return self.mutations.add_nodes(self.get_n_nodes(), n, states)
+
+    def remove_nodes(self, nodes):
+        """
+        Queue the removal of nodes, their rows in the state arrays are kept without any edges
+        """
+        self.mutations.remove_nodes(nodes)
+
+    def add_edges(self, sources, targets, weights=None):
+        self.mutations.add_edges(sources, targets, weights)
+
+    def remove_edges(self, sources, targets):
+        self.mutations.remove_edges(sources, targets)
+
+    def apply_mutations(self):
+        """
+        Apply all queued node and edge mutations to the graph, adjacency matrix, neighbor index,
+        utility layer, node states and history in one batch
+        """
+        if not len(self.mutations):
+            return
+        if self.graph is not None:
+            self.own_graph()
+            self.mutations.apply_graph(self.graph, self.get_n_nodes())
+        adjacency = self.adjacency if self.has_sparse_adjacency() else self.adjacency.copy()
+        self.adjacency = self.mutations.apply_adjacency(adjacency, self.is_directed())
+        self.update_neighbor_index()
+        if self.mutations.n_added and self.node_states.ndim > 1:
+            self.node_states = self.mutations.apply_states(self.node_states, self.state_map)
+            self.history.resize_nodes(self.get_n_nodes())
+        for prop in self.property_functions:
+            prop.invalidate()
+        self.mutations.clear()
+        self.invalidate_plan()
+
+    def own_graph(self):
+        """
+        Copy the graph before it is mutated when it is shared with clones,
+        arguments referring to the shared graph are rebound to the copy
+        """
+        if self.mutations.owns_graph:
+            return
+        graph = self.graph
+        self.graph = graph.copy()
+        for obj, attribute in [(scheme, 'args') for scheme in self.schemes] + \
+                [(update, 'arguments') for scheme in self.schemes for update in scheme.updates] + \
+                [(prop, 'params') for prop in self.property_functions]:
+            args = getattr(obj, attribute)
+            setattr(obj, attribute, {key: self.graph if value is graph else value for key, value in args.items()})
+        self.mutations.owns_graph = True
+
+    @property
+    def simulation_output(self):
+        return self.history.to_array()
 
     def simulate(self, n, show_tqdm=True):
-        self.simulation_output = []
-        if self.config.save_disk:
-            with open(self.config.path, 'w') as f:
-                f.write('# Output array shape:\n#({0}, {1}, {2})\n'.format(int(n / self.config.save_interval), len(self.nodes), len(self.state_names)))
-                self.simulation_steps(n, show_tqdm, f)
-        else:
-            self.simulation_steps(n, show_tqdm)
+        self.apply_mutations()
+        self.allocate_history(self.count_snapshots(n, self.config.memory_interval))
+        for prop in self.property_functions:
+            # Properties are calculated before the iteration counter is incremented
+            interval = prop.iteration_interval
+            prop.allocate((self.current_iteration + n - 1) // interval - (self.current_iteration - 1) // interval)
+        with self.compile():
+            try:
+                with self.open_writer(n) as writer:
+                    self.simulation_steps(n, show_tqdm, writer)
+            finally:
+                # Network mutations during the simulation recompile the plan, the last plan is closed as well
+                if self.plan:
+                    self.plan.close()
         return self.simulation_output
 
-    def simulation_steps(self, n, show_tqdm, f=None):
+    def count_snapshots(self, n, interval, start=None):
+        """
+        Number of iterations in the next n iterations that are a multiple of the interval,
+        counting from start or the current iteration
+        """
+        start = self.current_iteration if start is None else start
+        return (start + n) // interval - start // interval
+
+    def allocate_history(self, length):
+        """
+        Allocate the history for a simulation saving length states,
+        a positive state memory keeps only the last state_memory saved states
+        """
+        if self.config.state_memory == -1:
+            capacity = 0
+        elif self.config.state_memory == 0:
+            capacity = length
+        else:
+            capacity = self.config.state_memory
+        buffer = self.shared.allocate_history(capacity) if self.shared else None
+        self.history = StateHistory(capacity, self.node_states.shape, self.node_states.dtype, buffer)
+
+    @contextmanager
+    def open_writer(self, n, start=None):
+        """
+        Open the configured output file for the states saved in the next n iterations, counting from start,
+        as a context that closes it. Yields None when the states are not saved to disk.
+        Errors while closing the file do not replace an error raised in the context
+        """
+        if not self.config.save_disk:
+            yield None
+            return
+        length = self.count_snapshots(n, self.config.save_interval, start)
+        writer = StateWriter(self.config.path, (length,) + self.node_states.shape, self.node_states.dtype)
+        if self.config.async_io:
+            writer = AsyncStateWriter(writer, self.config.io_queue_size)
+        try:
+            yield writer
+        except BaseException:
+            try:
+                writer.close()
+            except Exception:
+                pass
+            raise
+        writer.close()
+
+    def simulation_steps(self, n, show_tqdm, writer=None):
         if show_tqdm:
             for _ in tqdm.tqdm(range(0, n)):
-                self.simulation_step(f)
+                self.simulation_step(writer)
         else:
             for _ in range(0, n):
-                self.simulation_step(f)
+                self.simulation_step(writer)
 
-    def simulation_step(self, f):
-        iteration_result = self.iteration()
-        if f and self.current_iteration % self.config.save_interval == 0:
-            np.savetxt(f, iteration_result)
-            f.write('# Iteration {0}\n'.format(self.current_iteration))
+    def simulation_step(self, writer):
+        iteration_result = self.advance()
+        if writer and self.current_iteration % self.config.save_interval == 0:
+            writer.write(iteration_result)
         if self.config.state_memory != -1 and self.current_iteration % self.config.memory_interval == 0:
-            self.simulation_output.append(copy.deepcopy(iteration_result))
-        if self.config.state_memory > 0 and len(self.simulation_output) > self.config.state_memory:
-            self.simulation_output = []
+            self.history.append(iteration_result)
+        if self.shared:
+            self.shared.publish(self.node_states, self.current_iteration, self.history)
+
+    def next_buffer(self):
+        """
+        Return the preallocated buffer the next states are written to,
+        initialized with the current states
+        """
+        if self.next_states.shape != self.node_states.shape or self.next_states.dtype != self.node_states.dtype:
+            if self.next_states.ndim > 1 and self.next_states.shape[:-2] == self.node_states.shape[:-2] \
+                    and self.next_states.shape[-1] == self.node_states.shape[-1] \
+                    and self.next_states.dtype == self.node_states.dtype:
+                # Only the number of nodes changed
+                self.next_states = resize_rows(self.next_states, self.node_states.shape[-2])
+            else:
+                self.next_states = np.empty_like(self.node_states)
+        np.copyto(self.next_states, self.node_states)
+        return self.next_states
 
     def iteration(self):
-        new_states = copy.deepcopy(self.node_states)
-        # For every scheme
-        for scheme in self.schemes:
-            if self.inactive_scheme(scheme):
-                continue
-            scheme_nodes = scheme.sample()
-            # For all the updates in the scheme
-            for update in scheme.updates:
-                update_nodes = self.valid_update_condition_nodes(update, scheme_nodes)
-                if (len(update_nodes) == 0):
-                    continue
-                if update.get_nodes:
-                    updatables = update.execute(update_nodes)
-                else:
-                    updatables = update.execute()
-                new_states = self.update_state(update_nodes, updatables, new_states)
-        self.node_states = new_states
+        """
+        Execute one iteration and return a copy of the new node states
+        """
+        return self.advance().copy()
+
+    def advance(self):
+        """
+        Execute one iteration and return the new node states without copying them,
+        the returned buffer is overwritten with the states of two iterations later
+        """
+        if self.plan is None:
+            self.compile()
+        new_states = self.plan.execute(self.next_buffer(), self.current_iteration)
+        # Swap the buffers, the old states are overwritten during the next iteration
+        self.node_states, self.next_states = new_states, self.node_states
+        self.apply_mutations()
         self.calculate_properties()
         self.current_iteration += 1
         return self.node_states
@@ -176,28 +529,46 @@ class Model(object, metaclass=ABCMeta):
     def valid_update_condition_nodes(self, update, scheme_nodes):
         if not update.condition:
             return scheme_nodes
-        return update.condition.get_valid_nodes((scheme_nodes, self.node_states, self.adjacency, None))
+        return update.condition.get_valid_nodes((scheme_nodes, self.node_states, self.adjacency, self.get_utility(),
+                                                 self.neighbor_index))
 
-    def calculate_properties(self):
+    def calculate_properties(self, iteration=None):
+        """
+        Evaluate the property functions due at the given iteration, the current iteration by default
+        """
+        iteration = self.current_iteration if iteration is None else iteration
         for prop in self.property_functions:
-            if self.current_iteration % prop.iteration_interval == 0:
-                property_outputs = self.properties.get(prop.name, [])
-                property_outputs.append(prop.execute())
-                self.properties[prop.name] = property_outputs
+            if iteration % prop.iteration_interval == 0:
+                prop.evaluate(self)
+                self.properties[prop.name] = prop.get_values()
 
     def get_properties(self):
+        """
+        Results of the property functions by name, as arrays with a result per evaluation instead of lists
+        """
         return self.properties
 
     def update_state(self, nodes, updatables, node_states):
+        """
+        Write update outputs to the node states, outputs are arrays with a value per node,
+        (indices, values) tuples or {node: value} dictionaries
+        """
         for state, update_output in updatables.items():
-            if isinstance(update_output, list) or isinstance(update_output, np.ndarray):
-                node_states[nodes, self.state_map[state]] = update_output
-            elif isinstance(update_output, dict):
-                # Add a 2d array implementation instead of for loop
-                for node, values in update_output.items():
-                    node_states[node, self.state_map[state]] = values
+            write_output(node_states, nodes, self.state_map[state], update_output)
         return node_states
 
+    def apply_update(self, update, nodes):
+        """
+        Execute an update for the given nodes and write its outputs directly to the current states,
+        as used by asynchronous engines. Returns the nodes whose states may have changed
+        """
+        if isinstance(update, KernelUpdate):
+            update.execute_kernel(nodes, self.node_states, self.node_states, self.neighbor_index)
+            return np.unique(np.concatenate([nodes] + [self.get_neighbors(node) for node in nodes]).astype(np.int64))
+        outputs = update.execute(nodes) if update.get_nodes else update.execute()
+        self.update_state(nodes, outputs, self.node_states)
+        return changed_nodes(nodes, outputs)
+
     def inactive_scheme(self, scheme):
         if scheme.lower_bound and scheme.lower_bound > self.current_iteration:
             return True
@@ -207,7 +578,7 @@ class Model(object, metaclass=ABCMeta):
 
     def configure_visualization(self, options, output):
         configuration = VisualizationConfiguration(options)
-        self.visualizer = Visualizer(configuration, self.graph, self.state_map, output)
+        self.visualizer = Visualizer(configuration, self.get_graph(), self.state_map, output)
 
     def visualize(self, vis_type):
         self.visualizer.visualize(vis_type)
@@ -216,11 +587,79 @@ class Model(object, metaclass=ABCMeta):
         self.state_map = {}
         self.state_names = []
         self.node_states = np.array([])
+        self.next_states = np.array([])
+        self.history = StateHistory(0, (0,))
         self.property_functions = []
         self.properties = {}
         self.schemes: List[Scheme] = [Scheme(lambda graph: graph.nodes, {'graph': self.graph}, lower_bound=0)]
+        self.invalidate_plan()
         self.current_iteration = 0
 
+    def refers_to_self(self):
+        """
+        Whether scheme, update or property functions refer to this model other than through their arguments,
+        these references can not be rebound to clones
+        """
+        functions = [scheme.sample_function for scheme in self.schemes] + \
+            [update.function for scheme in self.schemes for update in scheme.updates] + \
+            [prop.fun for prop in self.property_functions]
+        return any(refers_to(function, self) for function in functions)
+
+    def clone(self):
+        """
+        Create an isolated run instance of the model.
+        The graph, adjacency matrix, neighbor index and configuration are shared,
+        while the node states, constants, utilities, history and properties are allocated for the clone.
+        Arguments of updates, schemes and property functions that refer to this model, its constants or utility layer
+        are rebound to the clone, functions closing over this model are not, see refers_to_self
+        """
+        clone = copy.copy(self)
+        try:
+            clone.constants = dict(self.constants)
+        except AttributeError:
+            pass
+        clone.node_states = self.node_states.copy()
+        clone.shared = None
+        clone.utility = self.utility.copy() if self.utility else None
+        clone.mutations = NetworkMutations()
+        clone.mutations.owns_graph = self.mutations.owns_graph = False
+        clone.next_states = np.array([])
+        clone.history = StateHistory(0, self.node_states.shape, self.node_states.dtype)
+        clone.properties = {}
+        clone.plan = None
+        clone.schemes = []
+        for scheme in self.schemes:
+            scheme = self.rebind_copy(scheme, 'args', clone)
+            if isinstance(scheme.sample_function, NodeSampler):
+                scheme.sample_function = scheme.sample_function.bind(clone)
+            scheme.updates = [self.rebind_copy(update, 'arguments', clone) for update in scheme.updates]
+            clone.schemes.append(scheme)
+        clone.property_functions = [self.rebind_copy(prop, 'params', clone) for prop in self.property_functions]
+        for prop in clone.property_functions:
+            prop.reset()
+        return clone
+
+    def rebind_copy(self, obj, attribute, clone):
+        """
+        Shallow copy an object with the arguments stored in the given attribute rebound to the clone
+        """
+        rebound = copy.copy(obj)
+        setattr(rebound, attribute, self.rebind_arguments(getattr(obj, attribute), clone))
+        return rebound
+
+    def rebind_arguments(self, args, clone):
+        """
+        Replace references to this model, its constants or utility layer in the arguments by those of the clone
+        """
+        bindings = {id(self): clone}
+        if self.utility:
+            bindings[id(self.utility)] = clone.utility
+        try:
+            bindings[id(self.constants)] = clone.constants
+        except AttributeError:
+            pass
+        return {key: bindings.get(id(value), value) for key, value in args.items()}
+
     def reset(self):
-        self.node_states = np.zeros((len(self.graph.nodes()), len(self.state_names)))
+        self.node_states = self.allocate_states((self.get_n_nodes(), len(self.state_names)))
         self.current_iteration = 0
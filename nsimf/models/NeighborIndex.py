@@ -0,0 +1,64 @@
+import numpy as np
+import scipy.sparse as sp
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+class NeighborIndex(object):
+    """
+    Array backed neighbor index in CSR layout,
+    the neighbors of node i are indices[indptr[i]:indptr[i + 1]]
+    and the matching edge weights are stored in weights
+    """
+    def __init__(self, adjacency):
+        self.matrix = sp.csr_array(adjacency)
+        self.matrix.sort_indices()
+        self.indptr = self.matrix.indptr
+        self.indices = self.matrix.indices
+        self.weights = self.matrix.data
+        self.n_nodes = self.matrix.shape[0]
+        self.degrees = np.diff(self.indptr)
+        self.strengths = np.asarray(self.matrix.sum(axis=1)).ravel()
+
+    def neighbors(self, node):
+        """
+        Zero-copy view of the neighbors of a node
+        """
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def all_neighbors(self):
+        return np.split(self.indices, self.indptr[1:-1])
+
+    def sample(self, nodes=None, mask=False):
+        """
+        Sample one uniformly random neighbor for every node.
+        Nodes without neighbors raise a ValueError, unless mask is set:
+        then the mask of the nodes with neighbors is returned as well and nodes without neighbors are assigned -1,
+        which should not be used as an index
+        """
+        nodes = np.arange(self.n_nodes) if nodes is None else np.asarray(nodes)
+        degrees = self.degrees[nodes]
+        has_neighbors = degrees > 0
+        if not mask and not has_neighbors.all():
+            raise ValueError('Nodes without neighbors can not sample a neighbor: '
+                             + str(list(nodes[~has_neighbors][:10])))
+        positions = self.indptr[nodes] + (np.random.random(len(nodes)) * degrees).astype(int)
+        sampled = np.full(len(nodes), -1, dtype=self.indices.dtype)
+        sampled[has_neighbors] = self.indices[positions[has_neighbors]]
+        return (sampled, has_neighbors) if mask else sampled
+
+    def sum(self, values):
+        """
+        Weighted sum of values over the neighbors of every node,
+        the last axis of values should be the node axis
+        """
+        return (self.matrix @ values.T).T
+
+    def mean(self, values):
+        """
+        Weighted mean of values over the neighbors of every node,
+        nodes without neighbors get a mean of 0
+        """
+        summed = self.sum(values)
+        return np.divide(summed, self.strengths, out=np.zeros(summed.shape), where=self.strengths != 0)
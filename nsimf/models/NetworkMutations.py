@@ -0,0 +1,149 @@
+import numpy as np
+import scipy.sparse as sp
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+def resize_rows(array, n, fill=0):
+    """
+    Resize the node axis (second to last) of an array to n rows with amortized growth.
+    The result is a view on a buffer that is doubled when it runs out of rows,
+    new rows are set to the fill value
+    """
+    rows = array.shape[-2]
+    if n == rows:
+        return array
+    base = array.base if array.base is not None and array.base.shape[:-2] == array.shape[:-2] \
+        and array.base.shape[-1] == array.shape[-1] and array.base.dtype == array.dtype else array
+    if n > base.shape[-2]:
+        shape = array.shape[:-2] + (max(n, 2 * base.shape[-2]), array.shape[-1])
+        base = np.empty(shape, dtype=array.dtype)
+        base[..., :min(rows, n), :] = array[..., :min(rows, n), :]
+    resized = base[..., :n, :]
+    if n > rows:
+        resized[..., rows:, :] = fill
+    return resized
+
+
+def edge_keys(sources, targets, n_nodes):
+    return np.asarray(sources, dtype=np.int64) * n_nodes + np.asarray(targets, dtype=np.int64)
+
+
+class NetworkMutations(object):
+    """
+    Batch of node and edge insertions and deletions, applied to a model at once.
+    Node ids are never reused, so the row of a node in the state array stays the same
+    and removed nodes keep their rows without any edges
+    """
+    def __init__(self):
+        self.owns_graph = True
+        self.clear()
+
+    def __len__(self):
+        return self.n_added + len(self.removed_nodes) + len(self.added_edges) + len(self.removed_edges)
+
+    def clear(self):
+        self.n_added = 0
+        self.added_states = []
+        self.removed_nodes = []
+        self.added_edges = []
+        self.removed_edges = []
+
+    def add_nodes(self, n_nodes, n, states=None):
+        """
+        Queue n new nodes, returning their ids given the current number of nodes
+        """
+        nodes = np.arange(n_nodes + self.n_added, n_nodes + self.n_added + n)
+        self.n_added += n
+        if states is not None:
+            self.added_states.append((nodes, states))
+        return nodes
+
+    def remove_nodes(self, nodes):
+        self.removed_nodes.append(np.asarray(nodes, dtype=np.int64).ravel())
+
+    def add_edges(self, sources, targets, weights=None):
+        sources = np.asarray(sources, dtype=np.int64).ravel()
+        targets = np.asarray(targets, dtype=np.int64).ravel()
+        weights = np.broadcast_to(np.asarray(1. if weights is None else weights, dtype=float), sources.shape)
+        self.added_edges.append((sources, targets, weights))
+
+    def remove_edges(self, sources, targets):
+        self.removed_edges.append((np.asarray(sources, dtype=np.int64).ravel(),
+                                   np.asarray(targets, dtype=np.int64).ravel()))
+
+    def edges(self, directed, edges):
+        """
+        Concatenate queued edges, mirroring them for undirected graphs
+        """
+        columns = [np.concatenate(column) for column in zip(*edges)]
+        if directed:
+            return columns
+        sources, targets = columns[:2]
+        return [np.concatenate((sources, targets)), np.concatenate((targets, sources))] + \
+            [np.concatenate((column, column)) for column in columns[2:]]
+
+    def apply_graph(self, graph, n_nodes):
+        """
+        Apply the queued mutations to a networkx graph,
+        edges are removed before edges are added and node removals are applied last
+        """
+        graph.add_nodes_from(range(n_nodes, n_nodes + self.n_added))
+        for sources, targets in self.removed_edges:
+            graph.remove_edges_from(zip(sources.tolist(), targets.tolist()))
+        for sources, targets, weights in self.added_edges:
+            graph.add_weighted_edges_from(zip(sources.tolist(), targets.tolist(), weights.tolist()))
+        for nodes in self.removed_nodes:
+            graph.remove_nodes_from(nodes.tolist())
+
+    def apply_adjacency(self, adjacency, directed):
+        """
+        Apply the queued mutations to a dense or sparse adjacency matrix in the same order as the graph,
+        sparse matrices are rebuilt from their edge arrays in O(E log E) instead of from the graph
+        """
+        n = adjacency.shape[0] + self.n_added
+        removed = np.concatenate(self.removed_nodes) if self.removed_nodes else np.array([], dtype=np.int64)
+        if not sp.issparse(adjacency):
+            adjacency = np.pad(adjacency, ((0, self.n_added), (0, self.n_added))) if self.n_added else adjacency
+            if self.removed_edges:
+                sources, targets = self.edges(directed, self.removed_edges)
+                adjacency[sources, targets] = 0
+            if self.added_edges:
+                sources, targets, weights = self.edges(directed, self.added_edges)
+                adjacency[sources, targets] = weights
+            adjacency[removed, :] = 0
+            adjacency[:, removed] = 0
+            return adjacency
+
+        matrix = sp.coo_array(adjacency)
+        rows, columns, data = matrix.row.astype(np.int64), matrix.col.astype(np.int64), matrix.data
+        if self.removed_edges:
+            sources, targets = self.edges(directed, self.removed_edges)
+            keep = ~np.isin(edge_keys(rows, columns, n), edge_keys(sources, targets, n))
+            rows, columns, data = rows[keep], columns[keep], data[keep]
+        if self.added_edges:
+            sources, targets, weights = self.edges(directed, self.added_edges)
+            rows = np.concatenate((rows, sources))
+            columns = np.concatenate((columns, targets))
+            data = np.concatenate((data, weights))
+            # The last weight of an edge wins, like in networkx
+            _, last = np.unique(edge_keys(rows, columns, n)[::-1], return_index=True)
+            last = len(rows) - 1 - last
+            rows, columns, data = rows[last], columns[last], data[last]
+        if len(removed):
+            keep = ~(np.isin(rows, removed) | np.isin(columns, removed))
+            rows, columns, data = rows[keep], columns[keep], data[keep]
+        matrix = sp.coo_array((data, (rows, columns)), shape=(n, n))
+        return matrix.asformat(adjacency.format)
+
+    def apply_states(self, node_states, state_map):
+        """
+        Resize the node states to the new number of nodes and initialize the added nodes,
+        states of added nodes are given as a dict of state names to values
+        """
+        node_states = resize_rows(node_states, node_states.shape[-2] + self.n_added)
+        for nodes, states in self.added_states:
+            for state, values in states.items():
+                node_states[..., nodes, state_map[state]] = values
+        return node_states
@@ -0,0 +1,28 @@
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import reverse_cuthill_mckee
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+def partition_nodes(adjacency, k):
+    """
+    Greedily partition the nodes into k parts of equal size with a small edge cut.
+    The nodes are ordered breadth first by the reverse Cuthill-McKee ordering,
+    which keeps neighbors close together, and the ordering is cut into k contiguous parts
+    """
+    matrix = sp.csr_array(adjacency)
+    n = matrix.shape[0]
+    order = reverse_cuthill_mckee(matrix, symmetric_mode=False)
+    parts = np.empty(n, dtype=np.int64)
+    parts[order] = np.arange(n) * k // max(n, 1)
+    return parts
+
+
+def edge_cut(adjacency, parts):
+    """
+    Number of edges between nodes in different parts
+    """
+    matrix = sp.coo_array(adjacency)
+    return int(np.count_nonzero(parts[matrix.row] != parts[matrix.col]))
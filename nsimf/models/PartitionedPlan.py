@@ -0,0 +1,152 @@
+import multiprocessing as mp
+from threading import BrokenBarrierError
+import traceback
+
+import numpy as np
+
+from nsimf.models.Kernel import KernelUpdate
+from nsimf.models.Kernel import seed_kernels
+from nsimf.models.Partition import partition_nodes
+from nsimf.models.SharedStates import create_shared_array
+from nsimf.models.SharedStates import release
+from nsimf.models.UpdatePlan import UpdatePlan
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+def run_partition(plan, rank):
+    """
+    Worker loop of a partitioned plan, runs in a forked process
+    """
+    try:
+        plan.run_worker(rank)
+    except Exception:
+        plan.errors.put(traceback.format_exc())
+        plan.barrier.abort()
+
+
+class PartitionedPlan(UpdatePlan):
+    """
+    Update plan that executes every iteration on forked worker processes, each owning a part of the nodes.
+    The nodes are partitioned with a small edge cut, and the current and next node states are
+    placed in shared memory, so the states of boundary nodes in other parts are read directly
+    after the iteration barrier instead of being exchanged.
+
+    Only updates that receive their nodes and kernel updates can be partitioned.
+    Schemes are sampled by every worker and restricted to the nodes it owns,
+    so sampled schemes should select nodes independently of each other
+    """
+    def __init__(self, model, processes):
+        super(PartitionedPlan, self).__init__(model)
+        self.processes = processes
+        self.parts = partition_nodes(model.neighbor_index.matrix, processes)
+        self.workers = []
+        self.memory = []
+        self.buffers = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def validate(self):
+        for scheme in self.schemes:
+            for step in scheme.steps:
+                if not step.get_nodes and not isinstance(step.update, KernelUpdate):
+                    raise ValueError('Partitioned simulations require updates that receive their nodes')
+
+    def start(self):
+        """
+        Move the node states to shared memory, unless the model already keeps them there, and fork the workers
+        """
+        self.validate()
+        model = self.model
+        if model.shared:
+            self.buffers = [model.node_states, model.next_buffer()]
+        else:
+            for states in [model.node_states, model.next_buffer()]:
+                memory, buffer = create_shared_array(states.shape, states.dtype)
+                buffer[...] = states
+                self.memory.append(memory)
+                self.buffers.append(buffer)
+            model.node_states, model.next_states = self.buffers
+
+        context = mp.get_context('fork')
+        self.barrier = context.Barrier(self.processes + 1)
+        self.running = context.Value('b', 1)
+        self.iteration = context.Value('q', 0)
+        self.current = context.Value('b', 0)
+        self.errors = context.SimpleQueue()
+        self.seeds = np.random.randint(2 ** 31 - 1, size=self.processes)
+        self.workers = [context.Process(target=run_partition, args=(self, rank), daemon=True)
+                        for rank in range(self.processes)]
+        for worker in self.workers:
+            worker.start()
+
+    def run_worker(self, rank):
+        model = self.model
+        np.random.seed(self.seeds[rank])
+        seed_kernels(int(self.seeds[rank]))
+        owned = self.parts == rank
+        while True:
+            self.barrier.wait()
+            if not self.running.value:
+                return
+            current = self.current.value
+            model.node_states, model.next_states = self.buffers[current], self.buffers[1 - current]
+            model.current_iteration = self.iteration.value
+            self.execute_partition(model.next_states, model.current_iteration, owned)
+            if len(model.mutations):
+                raise ValueError('Network mutations are not supported in partitioned simulations')
+            self.barrier.wait()
+
+    def execute_partition(self, node_states, iteration, owned):
+        for scheme in self.schemes:
+            if not scheme.active(iteration):
+                continue
+            scheme_nodes = scheme.sample()
+            if not isinstance(scheme_nodes, np.ndarray):
+                scheme_nodes = np.fromiter(scheme_nodes, dtype=np.int64)
+            scheme_nodes = scheme_nodes[owned[scheme_nodes]]
+            for step in scheme.steps:
+                self.run_step(step, node_states, scheme_nodes)
+        # Other workers write the nodes they own, so the samplers of a worker are told all nodes may have changed
+        self.report_all_written()
+
+    def execute(self, node_states, iteration):
+        if not self.workers:
+            return super(PartitionedPlan, self).execute(node_states, iteration)
+        self.iteration.value = iteration
+        self.current.value = 0 if node_states is self.buffers[1] else 1
+        try:
+            self.barrier.wait()
+            self.barrier.wait()
+        except BrokenBarrierError:
+            raise RuntimeError('A partition worker failed:\n' + self.errors.get())
+        self.report_all_written()
+        return node_states
+
+    def close(self):
+        """
+        Stop the workers and move the node states back to private memory
+        """
+        super(PartitionedPlan, self).close()
+        if not self.workers:
+            return
+        try:
+            self.running.value = 0
+            self.barrier.wait(timeout=10)
+        except BrokenBarrierError:
+            pass
+        for worker in self.workers:
+            worker.join(timeout=10)
+            if worker.is_alive():
+                worker.terminate()
+        self.workers = []
+        self.buffers = []
+        if self.memory:
+            model = self.model
+            model.node_states, model.next_states = np.array(model.node_states), np.array(model.next_states)
+            for memory in self.memory:
+                release(memory)
+            self.memory = []
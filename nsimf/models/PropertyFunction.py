@@ -1,13 +1,168 @@
+import math
+
+import numpy as np
+
+from nsimf.models.Sampler import UniformSampler
+
 __author__ = "Mathijs Maijer"
 __email__ = "m.f.maijer@gmail.com"
 
+
+def sample_size(error, confidence=0.95):
+    """
+    Number of sampled nodes needed to estimate a mean of values in [0, 1],
+    like the average clustering, within the given absolute error at the given confidence (Hoeffding bound)
+    """
+    return int(math.ceil(math.log(2 / (1 - confidence)) / (2 * error ** 2)))
+
+
 class PropertyFunction(object):
+    """
+    Function evaluated every iteration_interval iterations, its results are stored in a preallocated array.
 
-    def __init__(self, name, function, iteration_interval, params):
+    Incremental functions receive their previous result and the indices of the nodes whose states were written
+    since then as the keyword arguments previous and changed. The written nodes are reported by the update plan,
+    states changed in other ways should be reported with states_changed.
+    previous is None when the result has to be computed from scratch, such as after network mutations.
+    Sampled functions receive a random sample of the nodes as the keyword argument nodes,
+    of the given number of samples or of the size needed to estimate a mean within the given error.
+    The dtype and shape of the results are inferred from the first result when no dtype is given,
+    the results are stored as objects once a result does not fit
+    """
+    def __init__(self, name, function, iteration_interval, params,
+                 incremental=False, samples=None, error=None, confidence=0.95, dtype=None):
         self.name = name
         self.fun = function
         self.iteration_interval = iteration_interval
         self.params = params
+        self.incremental = incremental
+        self.samples = sample_size(error, confidence) if error is not None else samples
+        self.dtype = dtype
+        self.reset()
+
+    def reset(self):
+        self.values = None
+        self.length = 0
+        self.capacity = 0
+        self.previous = None
+        self.invalidate()
+
+    def invalidate(self):
+        """
+        Compute the next result of an incremental function from scratch
+        """
+        self.evaluated = False
+        self.changed = []
+
+    def states_written(self, written):
+        """
+        Called by the update plan with the nodes written per state column, None when all nodes may have been written
+        """
+        for nodes in written.values():
+            self.changed.append(None if nodes is None else np.concatenate(nodes))
+
+    def states_changed(self, nodes=None):
+        """
+        Report nodes whose states changed outside of the update plan, all nodes when nodes is None
+        """
+        self.changed.append(None if nodes is None else np.asarray(nodes, dtype=np.int64).ravel())
+
+    def allocate(self, n):
+        """
+        Reserve space for n more results
+        """
+        self.capacity = max(self.capacity, self.length + n)
+        if self.values is not None and len(self.values) < self.capacity:
+            self.values = self.resize(self.capacity)
+
+    def resize(self, capacity):
+        values = np.empty((capacity,) + self.values.shape[1:], dtype=self.values.dtype)
+        values[:self.length] = self.values[:self.length]
+        return values
+
+    def execute(self, **kwargs):
+        return self.fun(**self.params, **kwargs)
+
+    def evaluate(self, model):
+        """
+        Evaluate the function on the current states of the model and store the result
+        """
+        kwargs = {}
+        if self.samples is not None:
+            kwargs['nodes'] = self.sample(model)
+        if self.incremental:
+            if not self.evaluated:
+                kwargs.update(previous=None, changed=None)
+            elif any(nodes is None for nodes in self.changed):
+                kwargs.update(previous=self.previous, changed=np.arange(model.get_n_nodes()))
+            else:
+                changed = np.unique(np.concatenate(self.changed)) if self.changed else np.array([], dtype=np.int64)
+                kwargs.update(previous=self.previous, changed=changed)
+            self.evaluated = True
+            self.changed = []
+        result = self.execute(**kwargs)
+        self.previous = result
+        self.append(result)
+        return result
+
+    def sample(self, model):
+        """
+        Sample node indices without listing all nodes,
+        unless the nodes of the graph are not the indices 0..N-1
+        """
+        n = model.get_n_nodes()
+        if self.samples >= n:
+            return model.nodes
+        indices = UniformSampler(model, self.samples)()
+        ordered = model.plan.all_nodes if model.plan else model.get_ordered_nodes()
+        if ordered is not None:
+            return indices
+        nodes = model.nodes
+        if isinstance(nodes, np.ndarray):
+            return nodes[indices[indices < len(nodes)]]
+        return [nodes[i] for i in indices if i < len(nodes)]
+
+    def append(self, result):
+        if self.values is None:
+            self.values = self.create(result, max(self.capacity, 1))
+        else:
+            self.fit(result)
+            if self.length == len(self.values):
+                # Results outside of a simulation grow the array by doubling
+                self.values = self.resize(2 * len(self.values))
+        self.values[self.length] = result
+        self.length += 1
+
+    def fit(self, result):
+        """
+        Convert the results to a dtype the result can be stored in without loss,
+        or to objects when its shape differs
+        """
+        if self.values.dtype == object:
+            return
+        try:
+            value = np.asarray(result)
+        except ValueError:
+            value = np.empty((), dtype=object)
+        if value.shape != self.values.shape[1:] or value.dtype == object or value.dtype.kind in 'USV':
+            objects = np.empty(len(self.values), dtype=object)
+            for i in range(self.length):
+                objects[i] = self.values[i]
+            self.values = objects
+        elif self.dtype is None and not np.can_cast(value.dtype, self.values.dtype, 'same_kind'):
+            self.values = self.values.astype(np.result_type(value.dtype, self.values.dtype))
+
+    def create(self, result, capacity):
+        if self.dtype is not None:
+            return np.empty((capacity,) + np.shape(result), dtype=self.dtype)
+        try:
+            value = np.asarray(result)
+        except ValueError:
+            value = np.empty((), dtype=object)
+        if value.dtype == object or value.dtype.kind in 'USV':
+            # Results that are not numeric are stored as objects
+            return np.empty(capacity, dtype=object)
+        return np.empty((capacity,) + value.shape, dtype=value.dtype)
 
-    def execute(self):
-        return self.fun(**self.params)
+    def get_values(self):
+        return self.values[:self.length] if self.values is not None else np.array([])
@@ -1,19 +1,52 @@
-# import multiprocessing as mp
+import multiprocessing as mp
 import copy
 import numpy as np
 from SALib.sample import saltelli
 from SALib.analyze import sobol
 
+from nsimf.models.Kernel import seed_kernels
+from nsimf.models.Model import refers_to
+
 __author__ = "Mathijs Maijer"
 __email__ = "m.f.maijer@gmail.com"
 
 
+# The analysis that forked worker processes run their samples with
+active_analysis = None
+
+
+def run_sample(sample):
+    """
+    Run a single parameter sample in a worker process
+    """
+    return active_analysis.run_sample(*sample)
+
+
+def seed_worker():
+    """
+    Seed a forked worker process with fresh entropy,
+    otherwise all workers continue from the random state of the parent and draw the same numbers
+    """
+    seed = int(np.random.SeedSequence().generate_state(1)[0])
+    np.random.seed(seed)
+    seed_kernels(seed)
+
+
 class SAConfiguration(object):
     """
     Configuration for Sensitivity Analysis
+
+    processes sets the amount of worker processes the samples are run on,
+    chunksize the amount of samples handed to a worker at once.
+    When a seed is given every sample is seeded with seed + its index,
+    making the results independent of the amount of processes.
+    Without a seed every worker process is seeded with fresh entropy
     TODO: Validate attributes
     """
     def __init__(self, iterable=(), **kwargs):
+        self.processes = 1
+        self.chunksize = 1
+        self.seed = None
         self.__dict__.update(iterable, **kwargs)
         self.validate()
 
@@ -22,6 +55,12 @@ class SAConfiguration(object):
 
 
 class SensitivityAnalysis(object):
+    mapping = {
+        'mean': np.mean,
+        'variance': np.var,
+        'min': np.min,
+        'max': np.max
+    }
 
     def __init__(self, config, model):
         self.config = config
@@ -43,66 +82,154 @@ class SensitivityAnalysis(object):
         problem, param_values = self.get_saltelli_params()
 
         print('Running Simulation...')
-        outputs = []
-        # Optimize by using parallel processing to run multiple simulations at once
-        for i in range(len(param_values)):
-            print('Running simulation ' + str(i + 1) + '/' + str(len(param_values)))
-            outputs.append(self.run_model(param_values[i], problem['names']))
-
-        print('Parsing outputs...')
-        out = self.parse(outputs)
+        out = self.run_models(param_values, problem['names'])
         print(out)
         print('Running sensitivity analysis...')
         return self.analyze_output(problem, out)
 
-    def run_model(self, params, names):
-        self.set_model(params, names)
+    def run_models(self, param_values, names):
+        """
+        Run all samples and reduce every output as soon as its run finishes,
+        the reductions are stored by sample index in preallocated arrays
+        """
+        if self.config.processes > 1:
+            reductions = self.run_parallel(param_values, names)
+        else:
+            reductions = self.run_serial(param_values, names)
+        return self.collect(reductions, len(param_values))
+
+    def collect(self, reductions, n):
+        results = None
+        for i, reduction in enumerate(reductions):
+            if results is None:
+                results = self.allocate_results(reduction, n)
+            self.store_reduction(results, i, reduction)
+        return results
+
+    def run_serial(self, param_values, names):
+        for i in range(len(param_values)):
+            print('Running simulation ' + str(i + 1) + '/' + str(len(param_values)))
+            yield self.run_sample(i, param_values[i], names)
+
+    def run_parallel(self, param_values, names):
+        """
+        Run the samples on a pool of forked processes, each worker runs on its own copy of the model.
+        The reductions are yielded in sample order
+        """
+        global active_analysis
+        active_analysis = self
+        samples = [(i, params, names) for i, params in enumerate(param_values)]
+        print('Running ' + str(len(samples)) + ' simulations on ' + str(self.config.processes) + ' processes')
+        initializer = seed_worker if self.config.seed is None else None
+        try:
+            with mp.get_context('fork').Pool(self.config.processes, initializer) as pool:
+                yield from pool.imap(run_sample, samples, chunksize=self.config.chunksize)
+        finally:
+            active_analysis = None
+
+    def run_sample(self, i, params, names):
+        if self.config.seed is not None:
+            np.random.seed(self.config.seed + i)
+            seed_kernels(self.config.seed + i)
+        return self.reduce(self.run_model(params, names))
 
-        if self.config.algorithm_input == 'network':
-            self.model.simulate(self.config.iterations, show_tqdm=False)
-            return copy.deepcopy(self.model.graph)
+    def run_model(self, params, names):
+        """
+        Run a simulation on an isolated clone of the model.
+        Clones can not rebind functions that refer to the model other than through their arguments,
+        the model is then reset and simulated in place instead
+        """
+        if self.in_place():
+            model = self.model
+            model.reset()
         else:
-            return self.model.simulate(self.config.iterations, show_tqdm=False)
+            model = self.model.clone()
+        config = model.config
+        self.set_model(model, params, names)
+        self.limit_memory(model)
+
+        try:
+            if self.config.algorithm_input == 'network':
+                model.simulate(self.config.iterations, show_tqdm=False)
+                # Network mutations copy the shared graph, so this is the network of this run
+                return model.get_graph()
+            else:
+                return model.simulate(self.config.iterations, show_tqdm=False)
+        finally:
+            model.config = config
+
+    def in_place(self):
+        initial_state = self.config.initial_state.values()
+        return self.model.refers_to_self() or any(refers_to(value, self.model) for value in initial_state)
+
+    def limit_memory(self, model):
+        """
+        Only keep the states the reduction needs,
+        state reductions only use the last saved states
+        """
+        model.config = copy.copy(model.config)
+        if self.config.algorithm_input == 'network':
+            model.config.state_memory = -1
+        elif self.config.algorithm in self.mapping or self.config.output_type != 'reduce':
+            model.config.state_memory = 1
 
-    def set_model(self, params, names):
+    def set_model(self, model, params, names):
         for i, name in enumerate(names):
-            self.model.constants[name] = params[i]
-        self.model.set_initial_state(self.config.initial_state, self.config.initial_args)
+            model.constants[name] = params[i]
+        args = self.model.rebind_arguments(self.config.initial_args or {}, model)
+        model.set_initial_state(self.config.initial_state, args)
 
     def parse(self, outputs):
-        mapping = {
-            'mean': np.mean,
-            'variance': np.var,
-            'min': np.min,
-            'max': np.max
-        }
-        if self.config.algorithm in list(mapping.keys()):
-            return self.state_reduce(outputs, mapping[self.config.algorithm])
-        else:
-            return self.custom_reduce(outputs)
+        """
+        Reduce the outputs of finished runs, run_models reduces every output as soon as its run finishes
+        """
+        return self.collect((self.reduce(output) for output in outputs), len(outputs))
 
     def custom_reduce(self, outputs):
         if self.config.output_type == 'reduce':
-            res = np.array([])
-            for output in outputs:
-                res = np.append(res, self.config.algorithm(output, **self.config.algorithm_args))
+            reductions = (self.config.algorithm(output, **self.config.algorithm_args) for output in outputs)
         else:
-            return self.state_reduce(outputs, self.config.algorithm, self.config.algorithm_args)
-        return res
+            reductions = (self.state_reduce(output, self.config.algorithm, self.config.algorithm_args)
+                          for output in outputs)
+        return self.collect(reductions, len(outputs))
+
+    def reduce(self, output):
+        """
+        Reduce the output of a single run to a value per state, or a single value
+        """
+        if self.config.algorithm in self.mapping:
+            return self.state_reduce(output, self.mapping[self.config.algorithm])
+        elif self.config.output_type == 'reduce':
+            return self.config.algorithm(output, **self.config.algorithm_args)
+        else:
+            return self.state_reduce(output, self.config.algorithm, self.config.algorithm_args)
 
-    def state_reduce(self, outputs, fun, args=None):
+    def state_reduce(self, output, fun, args=None):
         arguments = args if args else {}
-        res = self.get_state_dict()
-        for output in outputs:
-            for state in self.states:
-                res[state] = np.append(res[state], fun(output[-1][:, self.model.state_map[state]], **arguments))
-        return res
+        return {
+            state: fun(output[-1][:, self.model.state_map[state]], **arguments) for state in self.states
+        }
 
     def get_state_dict(self):
         return {
             var: np.array([]) for var in self.states
         }
 
+    def allocate_results(self, reduction, n):
+        if isinstance(reduction, dict):
+            return {
+                var: np.empty(n) for var in self.states
+            }
+        return np.empty(n)
+
+    @staticmethod
+    def store_reduction(results, i, reduction):
+        if isinstance(results, dict):
+            for state, value in reduction.items():
+                results[state][i] = value
+        else:
+            results[i] = reduction
+
     def analyze_output(self, problem, output):
         if isinstance(output, dict):
             # Perform the sobol analysis seperately for every status
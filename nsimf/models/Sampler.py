@@ -0,0 +1,141 @@
+import copy
+
+import numpy as np
+
+from nsimf.models.FenwickTree import FenwickTree
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+class NodeSampler(object):
+    """
+    Base class for scheme sample functions that sample the nodes of a model
+    """
+    def __init__(self, model):
+        self.model = model
+
+    def bind(self, model):
+        """
+        Copy the sampler to sample the nodes of another model, used when cloning models
+        """
+        sampler = copy.copy(self)
+        sampler.model = model
+        sampler.reset()
+        return sampler
+
+    def reset(self):
+        pass
+
+    def states_written(self, written):
+        """
+        Called by the update plan after every iteration with the nodes written per state column,
+        None instead of nodes when all nodes may have been written
+        """
+        pass
+
+
+class UniformSampler(NodeSampler):
+    """
+    Scheme sample function selecting size distinct nodes uniformly at random,
+    small samples are drawn without permuting all nodes
+    """
+    def __init__(self, model, size=1):
+        super(UniformSampler, self).__init__(model)
+        self.size = size
+
+    def __call__(self):
+        n = self.model.get_n_nodes()
+        if self.size >= n:
+            return np.arange(n)
+        if self.size * 4 > n:
+            return np.sort(np.random.choice(n, self.size, replace=False))
+        nodes = np.unique(np.random.randint(0, n, self.size))
+        while len(nodes) < self.size:
+            nodes = np.unique(np.concatenate((nodes, np.random.randint(0, n, self.size - len(nodes)))))
+        return nodes
+
+
+class BernoulliSampler(NodeSampler):
+    """
+    Scheme sample function selecting every node independently with probability p,
+    nodes are found by drawing geometric gaps, so the cost scales with the amount of selected nodes
+    """
+    def __init__(self, model, p):
+        if not 0 <= p <= 1:
+            raise ValueError('Probability should be between 0 and 1')
+        super(BernoulliSampler, self).__init__(model)
+        self.p = p
+
+    def __call__(self):
+        n = self.model.get_n_nodes()
+        if self.p == 0 or n == 0:
+            return np.array([], dtype=np.int64)
+        batch = int(n * self.p + 3 * np.sqrt(n * self.p) + 1)
+        gaps = np.random.geometric(self.p, batch)
+        nodes = np.cumsum(gaps) - 1
+        while nodes[-1] < n:
+            gaps = np.random.geometric(self.p, batch)
+            nodes = np.concatenate((nodes, nodes[-1] + np.cumsum(gaps)))
+        return nodes[:np.searchsorted(nodes, n)]
+
+
+class WeightedSampler(NodeSampler):
+    """
+    Scheme sample function selecting nodes proportional to the value of a state,
+    backed by a Fenwick tree so sampling a node costs O(log N).
+    The update plan reports the nodes whose state it wrote, and before sampling only their weights are updated,
+    unless most nodes were written. States changed outside of the update plan should be reported with update
+    """
+    def __init__(self, model, state, size=1, replace=False):
+        super(WeightedSampler, self).__init__(model)
+        self.state = state
+        self.size = size
+        self.replace = replace
+        self.reset()
+
+    def reset(self):
+        self.tree = None
+        self.pending = []
+
+    def states_written(self, written):
+        column = self.model.state_map[self.state]
+        if column in written:
+            nodes = written[column]
+            self.pending.append(None if nodes is None else np.concatenate(nodes))
+
+    def update(self, nodes):
+        """
+        Update the weights of the given nodes before the next sample, for changes made outside of the update plan
+        """
+        self.pending.append(np.asarray(nodes, dtype=np.int64).ravel())
+
+    def synchronize(self):
+        weights = self.model.get_state(self.state)
+        pending, self.pending = self.pending, []
+        if self.tree is None or self.tree.size != len(weights):
+            self.tree = FenwickTree(weights)
+        elif any(nodes is None for nodes in pending):
+            self.tree.build(weights)
+        elif pending:
+            changed = np.unique(np.concatenate(pending))
+            if len(changed) * max(1, self.tree.size.bit_length()) > self.tree.size:
+                self.tree.build(weights)
+            else:
+                for node in changed:
+                    self.tree.update(node, weights[node])
+
+    def __call__(self):
+        self.synchronize()
+        if self.replace or self.size == 1:
+            return self.tree.sample(self.size)
+        nodes = []
+        for _ in range(self.size):
+            node = self.tree.sample()[0]
+            nodes.append(node)
+            self.tree.update(node, 0)
+        # Restore the weights of the sampled nodes
+        weights = self.model.get_state(self.state)
+        for node in nodes:
+            self.tree.update(node, weights[node])
+        return np.array(nodes, dtype=np.int64)
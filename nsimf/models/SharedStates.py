@@ -0,0 +1,200 @@
+import multiprocessing as mp
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+import os
+
+import numpy as np
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+# Control block layout: generation, current buffer, iteration, history capacity, length and position,
+# followed by the name of the history segment
+GENERATION, CURRENT, ITERATION, CAPACITY, LENGTH, POSITION = range(6)
+NAME_OFFSET = 64
+NAME_SIZE = 64
+
+# Names of the segments created by this process
+created_names = set()
+
+
+class SharedBuffer(object):
+    """
+    Array interface of an array on a shared memory segment that keeps the segment open,
+    arrays created from it reference it, so the segment is closed after the last array on it is released
+    """
+    def __init__(self, memory, shape, dtype):
+        self.memory = memory
+        self.__array_interface__ = np.ndarray(shape, dtype=dtype, buffer=memory.buf).__array_interface__
+
+
+def shared_array(memory, shape, dtype):
+    return np.asarray(SharedBuffer(memory, shape, dtype))
+
+
+def create_shared_array(shape, dtype):
+    memory = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1))
+    created_names.add(memory.name)
+    return memory, shared_array(memory, shape, dtype)
+
+
+def attach_shared_array(name, shape, dtype, writeable=False):
+    """
+    Attach to an existing shared memory segment, without taking over its cleanup
+    """
+    try:
+        memory = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        memory = shared_memory.SharedMemory(name=name)
+        # Before Python 3.13 attached segments are registered with the resource tracker as well,
+        # which unlinks them when the process exits. Processes started by multiprocessing
+        # share the resource tracker of the creating process, which keeps the registration
+        if os.name == 'posix' and mp.parent_process() is None and name not in created_names:
+            resource_tracker.unregister('/' + memory.name, 'shared_memory')
+    array = shared_array(memory, shape, dtype)
+    array.flags.writeable = writeable
+    return memory, array
+
+
+def release(memory, unlink=True):
+    """
+    Drop a shared memory segment, it is closed when the last array on it is released
+    """
+    if unlink:
+        memory.unlink()
+        created_names.discard(memory.name)
+
+
+class SharedStatesHandle(object):
+    """
+    Picklable descriptor of the shared states of a model, used to attach from other processes
+    """
+    def __init__(self, control, buffers, shape, dtype, state_map):
+        self.control = control
+        self.buffers = buffers
+        self.shape = shape
+        self.dtype = dtype
+        self.state_map = state_map
+
+
+class SharedStates(object):
+    """
+    Double buffered node states and a state history in shared memory, owned by a model.
+    A control block tells readers which buffer holds the current states,
+    the current iteration and where the history is
+    """
+    def __init__(self, shape, dtype=float, state_map=None):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.state_map = dict(state_map) if state_map else {}
+        self.control_memory, control = create_shared_array(NAME_OFFSET + NAME_SIZE, np.uint8)
+        control[:] = 0
+        self.control = control[:NAME_OFFSET].view(np.int64)
+        self.name = control[NAME_OFFSET:]
+        self.memory = []
+        self.buffers = []
+        for _ in range(2):
+            memory, buffer = create_shared_array(self.shape, self.dtype)
+            buffer[...] = 0
+            self.memory.append(memory)
+            self.buffers.append(buffer)
+        self.history_memory = None
+
+    @property
+    def handle(self):
+        return SharedStatesHandle(self.control_memory.name, [memory.name for memory in self.memory],
+                                  self.shape, self.dtype.str, self.state_map)
+
+    def allocate_history(self, capacity):
+        """
+        Allocate a new history buffer in shared memory, replacing the previous one
+        """
+        memory, buffer = create_shared_array((capacity,) + self.shape, self.dtype)
+        name = memory.name.encode()
+        self.name[:] = 0
+        self.name[:len(name)] = np.frombuffer(name, dtype=np.uint8)
+        self.control[CAPACITY] = capacity
+        self.control[LENGTH] = self.control[POSITION] = 0
+        self.control[GENERATION] += 1
+        if self.history_memory:
+            release(self.history_memory)
+        self.history_memory = memory
+        return buffer
+
+    def publish(self, node_states, iteration, history):
+        """
+        Tell readers which buffer holds the current states and how much history is saved
+        """
+        self.control[CURRENT] = 1 if node_states is self.buffers[1] else 0
+        self.control[ITERATION] = iteration
+        self.control[LENGTH] = history.length
+        self.control[POSITION] = history.position
+
+    def close(self):
+        self.buffers = []
+        self.control = self.name = None
+        for memory in self.memory + [self.control_memory] + ([self.history_memory] if self.history_memory else []):
+            release(memory)
+        self.memory = []
+        self.history_memory = None
+
+
+class SharedStatesReader(object):
+    """
+    Read-only, zero-copy view on the shared states of a model running in another process.
+    The current states are overwritten two iterations later, so they should be copied when kept
+    """
+    def __init__(self, handle):
+        self.handle = handle
+        self.state_map = handle.state_map
+        self.control_memory, control = attach_shared_array(handle.control, NAME_OFFSET + NAME_SIZE, np.uint8)
+        self.control = control[:NAME_OFFSET].view(np.int64)
+        self.name = control[NAME_OFFSET:]
+        self.memory = []
+        self.buffers = []
+        for name in handle.buffers:
+            memory, buffer = attach_shared_array(name, handle.shape, handle.dtype)
+            self.memory.append(memory)
+            self.buffers.append(buffer)
+        self.generation = 0
+        self.history_memory = None
+        self.history_buffer = None
+
+    @property
+    def node_states(self):
+        return self.buffers[self.control[CURRENT]]
+
+    @property
+    def iteration(self):
+        return int(self.control[ITERATION])
+
+    def get_state(self, state):
+        return self.node_states[..., self.state_map[state]]
+
+    def get_history(self):
+        """
+        Get the saved states in chronological order,
+        this is a view unless the history buffer has wrapped around
+        """
+        if self.control[GENERATION] == 0:
+            return np.empty((0,) + tuple(self.handle.shape), dtype=self.handle.dtype)
+        if self.generation != self.control[GENERATION]:
+            if self.history_memory:
+                self.history_buffer = None
+                release(self.history_memory, unlink=False)
+            self.generation = self.control[GENERATION]
+            name = self.name.tobytes().rstrip(b'\x00').decode()
+            shape = (int(self.control[CAPACITY]),) + tuple(self.handle.shape)
+            self.history_memory, self.history_buffer = attach_shared_array(name, shape, self.handle.dtype)
+        length, position, capacity = self.control[LENGTH], self.control[POSITION], self.control[CAPACITY]
+        if length < capacity or position == 0:
+            return self.history_buffer[:length]
+        return np.concatenate((self.history_buffer[position:], self.history_buffer[:position]))
+
+    def close(self):
+        self.buffers = []
+        self.control = self.name = self.history_buffer = None
+        for memory in self.memory + [self.control_memory] + ([self.history_memory] if self.history_memory else []):
+            release(memory, unlink=False)
+        self.memory = []
+        self.history_memory = None
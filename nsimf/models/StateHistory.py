@@ -0,0 +1,75 @@
+import numpy as np
+
+from nsimf.models.NetworkMutations import resize_rows
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+class StateHistory(object):
+    """
+    Preallocated ring buffer that keeps the last capacity saved node states,
+    appending overwrites the oldest saved states once the buffer is full.
+    An existing buffer, for example in shared memory, can be given to store the states in
+    """
+    def __init__(self, capacity, shape, dtype=float, buffer=None):
+        self.capacity = capacity
+        self.buffer = np.empty((capacity,) + tuple(shape), dtype=dtype) if buffer is None else buffer
+        self.length = 0
+        self.position = 0
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        for i in range(self.length):
+            yield self[i]
+
+    def __getitem__(self, i):
+        """
+        Index the saved states chronologically, negative indices count back from the latest states.
+        Integer indices return views on the buffer
+        """
+        if not isinstance(i, (int, np.integer)):
+            return self.to_array()[i]
+        if i < -self.length or i >= self.length:
+            raise IndexError('History index out of range')
+        if i < 0:
+            i += self.length
+        return self.buffer[(self.position - self.length + i) % self.capacity]
+
+    def append(self, states):
+        if self.capacity == 0:
+            return
+        self.buffer[self.position] = states
+        self.position = (self.position + 1) % self.capacity
+        self.length = min(self.length + 1, self.capacity)
+
+    def resize_nodes(self, n):
+        """
+        Resize the node axis of the saved states, nodes added after a state was saved have NaN states.
+        The buffer grows with amortized doubling, so the saved states are not copied on every resize
+        """
+        if self.buffer.ndim < 3:
+            return
+        fill = np.nan if np.issubdtype(self.buffer.dtype, np.floating) else 0
+        self.buffer = resize_rows(self.buffer, n, fill)
+
+    def get_previous(self, n):
+        """
+        Get the states saved n saves before the latest saved states
+        """
+        return self[-n - 1]
+
+    def to_array(self):
+        """
+        Get all saved states in chronological order,
+        this is a view unless the buffer has wrapped around
+        """
+        if self.length < self.capacity or self.position == 0:
+            return self.buffer[:self.length]
+        return np.concatenate((self.buffer[self.position:], self.buffer[:self.position]))
+
+    def clear(self):
+        self.length = 0
+        self.position = 0
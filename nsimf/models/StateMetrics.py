@@ -0,0 +1,168 @@
+from functools import partial
+import weakref
+
+import numpy as np
+
+from nsimf.models.PropertyFunction import PropertyFunction
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+class StateMetrics(object):
+    """
+    Library of metrics over the node states, computed with vectorized reductions over all states at once.
+    The intermediate results they are derived from, the moments, sorted states and neighbor sums,
+    are computed once per iteration and shared between all metrics of a model.
+    Metrics are computed over all rows of the node states, including those of removed nodes,
+    and have the leading replica axis of ensemble models.
+
+    Use property to create a property function of a metric:
+        metrics = StateMetrics()
+        model.add_property_function(metrics.property(model, 'quantiles', 'A', q=[0.25, 0.5, 0.75]))
+    """
+    # Intermediate results that are computed together
+    groups = {'mean': 'moments', 'variance': 'moments', 'min': 'moments', 'max': 'moments'}
+
+    def __init__(self):
+        self.caches = weakref.WeakKeyDictionary()
+
+    def property(self, model, metric, state, name=None, iteration_interval=1, **kwargs):
+        """
+        Property function evaluating a metric of a state, named metric_state by default
+        """
+        name = name if name else metric + '_' + state
+        return PropertyFunction(name, partial(getattr(self, metric), state=state, **kwargs),
+                                iteration_interval, {'model': model})
+
+    def intermediate(self, model, name):
+        """
+        Get an intermediate result of the current states of a model, computing it on first use
+        """
+        key = (model.current_iteration, id(model.node_states), model.node_states.shape, id(model.neighbor_index))
+        cache = self.caches.get(model)
+        if cache is None or cache['key'] != key:
+            cache = {'key': key}
+            self.caches[model] = cache
+        if name not in cache:
+            cache.update(getattr(self, 'compute_' + self.groups.get(name, name))(model))
+        return cache[name]
+
+    def compute_moments(self, model):
+        states = model.node_states
+        mean = states.mean(axis=-2)
+        return {
+            'mean': mean,
+            'variance': np.square(states - np.expand_dims(mean, -2)).mean(axis=-2),
+            'min': states.min(axis=-2),
+            'max': states.max(axis=-2)
+        }
+
+    def compute_sorted(self, model):
+        return {'sorted': np.sort(model.node_states, axis=-2)}
+
+    def compute_polarization(self, model):
+        """
+        Mean absolute difference between the states of all pairs of nodes, in O(N) from the sorted states
+        """
+        ordered = self.intermediate(model, 'sorted')
+        n = ordered.shape[-2]
+        weights = (2 * np.arange(n) - n + 1)[:, None]
+        return {'polarization': 2 * (ordered * weights).sum(axis=-2) / max(n * (n - 1), 1)}
+
+    def compute_neighbors(self, model):
+        """
+        Edge sums of all states with one sparse product:
+        the weighted sums of x_i x_j, x_i, x_i^2, x_j and x_j^2 over the edges (i, j)
+        """
+        index = model.neighbor_index
+        states = model.node_states
+        shape = states.shape[:-2] + states.shape[-1:]
+        values = np.moveaxis(states, -1, -2).reshape(-1, states.shape[-2])
+        out_strengths = index.strengths
+        in_strengths = np.asarray(index.matrix.sum(axis=0)).ravel()
+        squares = np.square(values)
+        sums = {
+            'weight': out_strengths.sum(),
+            'product': (values * index.sum(values)).sum(axis=-1),
+            'source': values @ out_strengths,
+            'source_square': squares @ out_strengths,
+            'target': values @ in_strengths,
+            'target_square': squares @ in_strengths
+        }
+        return {'neighbors': {key: np.reshape(value, shape) if np.ndim(value) else value
+                              for key, value in sums.items()}}
+
+    def mean(self, model, state):
+        return self.intermediate(model, 'mean')[..., model.state_map[state]]
+
+    def variance(self, model, state):
+        return self.intermediate(model, 'variance')[..., model.state_map[state]]
+
+    def std(self, model, state):
+        return np.sqrt(self.variance(model, state))
+
+    def min(self, model, state):
+        return self.intermediate(model, 'min')[..., model.state_map[state]]
+
+    def max(self, model, state):
+        return self.intermediate(model, 'max')[..., model.state_map[state]]
+
+    def quantiles(self, model, state, q=(0.25, 0.5, 0.75)):
+        """
+        Quantiles of a state with linear interpolation, like numpy.quantile
+        """
+        ordered = self.intermediate(model, 'sorted')[..., model.state_map[state]]
+        positions = np.asarray(q, dtype=float) * (ordered.shape[-1] - 1)
+        lower = np.floor(positions).astype(int)
+        upper = np.ceil(positions).astype(int)
+        fraction = positions - lower
+        return ordered[..., lower] * (1 - fraction) + ordered[..., upper] * fraction
+
+    def median(self, model, state):
+        return self.quantiles(model, state, 0.5)
+
+    def histogram(self, model, state, bins=10, range=(0, 1)):
+        """
+        Counts of a state in equal width bins, like numpy.histogram.
+        Values outside of the range are not counted
+        """
+        ordered = self.intermediate(model, 'sorted')[..., model.state_map[state]]
+        edges = np.linspace(range[0], range[1], bins + 1)
+        rows = ordered.reshape(-1, ordered.shape[-1])
+        positions = np.empty((len(rows), bins + 1), dtype=np.int64)
+        for i, row in enumerate(rows):
+            positions[i, :-1] = np.searchsorted(row, edges[:-1], side='left')
+            # The last bin includes its right edge
+            positions[i, -1] = np.searchsorted(row, edges[-1], side='right')
+        return np.diff(positions, axis=-1).reshape(ordered.shape[:-1] + (bins,))
+
+    def polarization(self, model, state):
+        return self.intermediate(model, 'polarization')[..., model.state_map[state]]
+
+    def disagreement(self, model, state):
+        """
+        Weighted mean squared difference between the states of neighbors
+        """
+        sums = self.intermediate(model, 'neighbors')
+        s = model.state_map[state]
+        if not sums['weight']:
+            return np.zeros_like(sums['product'][..., s])
+        return (sums['source_square'][..., s] + sums['target_square'][..., s]
+                - 2 * sums['product'][..., s]) / sums['weight']
+
+    def assortativity(self, model, state):
+        """
+        Weighted Pearson correlation between the states of the sources and targets of the edges,
+        which is NaN when either has no variance
+        """
+        sums = self.intermediate(model, 'neighbors')
+        s = model.state_map[state]
+        weight = sums['weight']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            source_mean = sums['source'][..., s] / weight
+            target_mean = sums['target'][..., s] / weight
+            source_variance = sums['source_square'][..., s] / weight - source_mean ** 2
+            target_variance = sums['target_square'][..., s] / weight - target_mean ** 2
+            covariance = sums['product'][..., s] / weight - source_mean * target_mean
+            return covariance / np.sqrt(source_variance * target_variance)
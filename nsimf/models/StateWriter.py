@@ -0,0 +1,106 @@
+import queue
+import threading
+
+import numpy as np
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+class StateWriter(object):
+    """
+    Streams saved node states into a binary .npy file with a (T, N, S) layout,
+    the file is preallocated and written through a memory map
+    """
+    magic = b'\x93NUMPY'
+
+    def __init__(self, path, shape, dtype=float):
+        self.path = path
+        self.output = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=tuple(shape))
+        self.position = 0
+
+    def write(self, states):
+        self.output[self.position] = states
+        self.position += 1
+
+    def flush(self):
+        self.output.flush()
+
+    def close(self):
+        if self.output is not None:
+            self.flush()
+            self.output = None
+
+    @staticmethod
+    def is_binary(path):
+        with open(path, 'rb') as f:
+            return f.read(len(StateWriter.magic)) == StateWriter.magic
+
+    @staticmethod
+    def read(path):
+        """
+        Memory map a written states file, any iteration can be accessed
+        without loading the whole file
+        """
+        return np.load(path, mmap_mode='r')
+
+
+class AsyncStateWriter(object):
+    """
+    Hands saved states to a background thread that writes them with a StateWriter.
+    States are copied into one of queue_size preallocated buffers,
+    when all buffers are pending write blocks until one has been written
+    """
+    def __init__(self, writer, queue_size=4):
+        self.writer = writer
+        self.free_buffers = queue.Queue()
+        self.pending = queue.Queue()
+        self.error = None
+        self.n_buffers = max(1, queue_size)
+        for _ in range(self.n_buffers):
+            self.free_buffers.put(np.empty(writer.output.shape[1:], dtype=writer.output.dtype))
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def write(self, states):
+        self.raise_error()
+        buffer = self.free_buffers.get()
+        np.copyto(buffer, states)
+        self.pending.put(buffer)
+
+    def run(self):
+        while True:
+            buffer = self.pending.get()
+            if buffer is None:
+                break
+            try:
+                if self.error is None:
+                    self.writer.write(buffer)
+            except Exception as e:
+                self.error = e
+            finally:
+                self.free_buffers.put(buffer)
+
+    def raise_error(self):
+        if self.error is not None:
+            raise self.error
+
+    def flush(self):
+        """
+        Wait until all pending states have been written
+        """
+        buffers = [self.free_buffers.get() for _ in range(self.n_buffers)]
+        for buffer in buffers:
+            self.free_buffers.put(buffer)
+        self.raise_error()
+        self.writer.flush()
+
+    def close(self):
+        """
+        Write all pending states, stop the writer thread and close the file
+        """
+        if self.thread.is_alive():
+            self.pending.put(None)
+            self.thread.join()
+        self.writer.close()
+        self.raise_error()
@@ -5,13 +5,33 @@ __email__ = "m.f.maijer@gmail.com"
 class Update(object):
     """
     Update class
+
+    reads and writes optionally declare the states, or other resources like the utility layer,
+    the update reads and writes. Updates declaring both can be executed concurrently
+    with the independent updates next to them
     """
 
-    def __init__(self, fun, args=None, condition=None, get_nodes=False):
+    def __init__(self, fun, args=None, condition=None, get_nodes=False, reads=None, writes=None):
         self.function = fun
         self.arguments = args if args else {}
         self.condition = condition
         self.get_nodes = get_nodes
+        self.reads = set(reads) if reads is not None else None
+        self.writes = set(writes) if writes is not None else None
+
+    def is_independent(self, other, buffered=()):
+        """
+        Whether this update and the other update can be executed concurrently.
+        They may not write the same states, and may not read what the other writes in place.
+        States in buffered are written to the next states and read from the current states,
+        so reading a buffered state the other update writes is not a conflict.
+        Updates without declared reads and writes are never independent
+        """
+        if self.reads is None or self.writes is None or other.reads is None or other.writes is None:
+            return False
+        if self.writes & other.writes:
+            return False
+        return not ((self.writes - set(buffered)) & other.reads or (other.writes - set(buffered)) & self.reads)
 
     def execute(self, nodes=None):
         if self.get_nodes:
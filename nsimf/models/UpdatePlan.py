@@ -0,0 +1,323 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from nsimf.models.Kernel import KernelUpdate
+from nsimf.models.Sampler import NodeSampler
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+def write_array(node_states, nodes, column, output):
+    node_states[..., nodes, column] = output
+
+
+def write_arrays(node_states, nodes, columns, outputs):
+    """
+    Write the array outputs of multiple states for the same nodes in one batched assignment
+    """
+    nodes = np.asarray(nodes)
+    node_states[..., nodes[:, np.newaxis], columns] = np.stack(np.broadcast_arrays(*outputs), axis=-1)
+
+
+def write_all(node_states, nodes, column, output):
+    """
+    Write an output for all nodes, without fancy indexing the nodes
+    """
+    node_states[..., column] = output
+
+
+def write_sparse(node_states, nodes, column, output):
+    """
+    Write an (indices, values) output with a single fancy indexed assignment
+    """
+    indices, values = output
+    node_states[..., indices, column] = values
+
+
+def write_dict(node_states, nodes, column, output):
+    write_sparse(node_states, nodes, column, dict_to_sparse(output))
+
+
+def write_nothing(node_states, nodes, column, output):
+    pass
+
+
+def dict_to_sparse(output):
+    """
+    Convert a {node: value} output to an (indices, values) output
+    """
+    indices = np.fromiter(output.keys(), dtype=np.int64, count=len(output))
+    values = np.array(list(output.values()))
+    # Values with a replica axis are moved behind the node axis
+    return indices, np.moveaxis(values, 0, -1) if values.ndim > 1 else values
+
+
+def select_writer(output, all_nodes=False):
+    if isinstance(output, (list, np.ndarray)):
+        return write_all if all_nodes else write_array
+    elif isinstance(output, tuple):
+        return write_sparse
+    elif isinstance(output, dict):
+        return write_dict
+    return write_nothing
+
+
+def write_output(node_states, nodes, column, output, all_nodes=False):
+    select_writer(output, all_nodes)(node_states, nodes, column, output)
+
+
+def written_nodes(nodes, output):
+    """
+    Nodes an update output is written to, None when the output is not written
+    """
+    if isinstance(output, tuple):
+        return np.asarray(output[0])
+    elif isinstance(output, dict):
+        return np.fromiter(output.keys(), dtype=np.int64, count=len(output))
+    elif isinstance(output, (list, np.ndarray)):
+        return np.asarray(nodes)
+    return None
+
+
+def changed_nodes(nodes, outputs):
+    """
+    Nodes whose states are written by the given update outputs
+    """
+    changed = [written for written in (written_nodes(nodes, output) for output in outputs.values())
+               if written is not None]
+    if not changed:
+        return np.array([], dtype=np.int64)
+    return np.unique(np.concatenate(changed).astype(np.int64))
+
+
+class PlanStep(object):
+    """
+    A single update in an update plan,
+    output writers are specialized per state and output type the first time they are seen.
+    Array outputs of multiple states are written in one batched assignment
+    """
+    def __init__(self, update, state_map):
+        self.update = update
+        self.function = update.function
+        self.arguments = update.arguments
+        self.condition = update.condition
+        if self.condition:
+            self.condition.set_state_indices(state_map)
+        self.get_nodes = update.get_nodes
+        self.state_map = state_map
+        self.writers = {}
+
+    def run(self, node_states, nodes, all_nodes):
+        outputs = self.execute(nodes)
+        self.write(node_states, nodes, all_nodes, outputs)
+        return outputs
+
+    def execute(self, nodes):
+        if self.get_nodes:
+            return self.function(nodes, **self.arguments)
+        return self.function(**self.arguments)
+
+    def write(self, node_states, nodes, all_nodes, outputs):
+        columns = []
+        values = []
+        for state, output in outputs.items():
+            key = (state, type(output), all_nodes)
+            writer = self.writers.get(key)
+            if writer is None:
+                writer = self.writers[key] = (select_writer(output, all_nodes), self.state_map[state])
+            if writer[0] is write_array:
+                columns.append(writer[1])
+                values.append(output)
+            else:
+                writer[0](node_states, nodes, writer[1], output)
+        if len(columns) == 1:
+            write_array(node_states, nodes, columns[0], values[0])
+        elif columns:
+            write_arrays(node_states, nodes, columns, values)
+
+    def describe(self):
+        name = getattr(self.function, '__name__', repr(self.function))
+        condition = type(self.condition).__name__ if self.condition else None
+        writers = sorted('{0}: {1}'.format(state, writer[0].__name__) for (state, _, _), writer in self.writers.items())
+        return '{0}(get_nodes={1}, condition={2}, writers=[{3}])'.format(name, self.get_nodes, condition, ', '.join(writers))
+
+
+class KernelStep(PlanStep):
+    """
+    A kernel update in an update plan, the kernel writes the next states in place
+    """
+    def __init__(self, update, model):
+        super(KernelStep, self).__init__(update, model.state_map)
+        self.model = model
+        self.node_range = np.arange(model.node_states.shape[-2])
+
+    def run(self, node_states, nodes, all_nodes):
+        if all_nodes:
+            nodes = self.node_range
+        self.update.execute_kernel(nodes, self.model.node_states, node_states, self.model.neighbor_index)
+        return None
+
+    def describe(self):
+        name = getattr(self.function, '__name__', repr(self.function))
+        condition = type(self.condition).__name__ if self.condition else None
+        return '{0}(kernel, compiled={1}, condition={2})'.format(name, self.update.compiled, condition)
+
+
+class SchemePlan(object):
+    """
+    A scheme in an update plan with its active iteration window resolved.
+    With multiple threads, consecutive updates that are independent of each other are grouped
+    """
+    def __init__(self, scheme, model, threads=1):
+        self.scheme = scheme
+        self.sample_function = scheme.sample_function
+        self.args = scheme.args
+        self.lower_bound = scheme.lower_bound if scheme.lower_bound else 0
+        self.upper_bound = scheme.upper_bound if scheme.upper_bound else np.inf
+        self.steps = [
+            KernelStep(update, model) if isinstance(update, KernelUpdate) else PlanStep(update, model.state_map)
+            for update in scheme.updates
+        ]
+        self.groups = []
+        for step in self.steps:
+            if threads > 1 and self.groups and \
+                    all(step.update.is_independent(other.update, model.state_map) for other in self.groups[-1]):
+                self.groups[-1].append(step)
+            else:
+                self.groups.append([step])
+
+    def active(self, iteration):
+        return self.lower_bound <= iteration < self.upper_bound
+
+    def sample(self):
+        return self.sample_function(**self.args)
+
+
+class UpdatePlan(object):
+    """
+    Fixed execution plan of the schemes, updates and conditions of a model.
+    Scheme windows and state columns are resolved in advance,
+    and outputs for all nodes of an ordered graph are written without indexing the nodes.
+
+    Groups of independent updates are executed concurrently on a thread pool,
+    their outputs are written in the order of the updates, so the results do not depend on the threads.
+    Updates executed concurrently should not draw from the global NumPy random state.
+
+    The nodes written per state are reported to the node samplers of the schemes
+    and to incremental property functions after every iteration,
+    kernels may write any node, so all nodes of the states they write are reported
+    """
+    def __init__(self, model):
+        self.model = model
+        self.threads = getattr(model.config, 'update_threads', 1)
+        self.schemes = [SchemePlan(scheme, model, self.threads) for scheme in model.schemes]
+        self.all_nodes = model.get_ordered_nodes()
+        self.executor = None
+        self.samplers = [scheme.sample_function for scheme in model.schemes
+                         if isinstance(scheme.sample_function, NodeSampler)]
+        for sampler in self.samplers:
+            sampler.reset()
+        self.observers = self.samplers + [prop for prop in model.property_functions if prop.incremental]
+        self.written = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def execute(self, node_states, iteration):
+        for scheme in self.schemes:
+            if not scheme.active(iteration):
+                continue
+            scheme_nodes = scheme.sample()
+            for group in scheme.groups:
+                if len(group) == 1:
+                    self.run_step(group[0], node_states, scheme_nodes)
+                else:
+                    self.run_group(group, node_states, scheme_nodes)
+        self.report_written()
+        return node_states
+
+    def select_nodes(self, step, scheme_nodes):
+        if step.condition:
+            return self.model.valid_update_condition_nodes(step, scheme_nodes), False
+        return scheme_nodes, scheme_nodes is self.all_nodes
+
+    def run_step(self, step, node_states, scheme_nodes):
+        nodes, all_nodes = self.select_nodes(step, scheme_nodes)
+        if len(nodes):
+            self.record_written(step, nodes, all_nodes, step.run(node_states, nodes, all_nodes))
+
+    def run_group(self, group, node_states, scheme_nodes):
+        """
+        Execute a group of independent updates concurrently and write their outputs in order
+        """
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.threads)
+        selected = [self.select_nodes(step, scheme_nodes) for step in group]
+        futures = [self.executor.submit(step.execute, nodes) if len(nodes) else None
+                   for step, (nodes, _) in zip(group, selected)]
+        for step, (nodes, all_nodes), future in zip(group, selected, futures):
+            if future:
+                outputs = future.result()
+                step.write(node_states, nodes, all_nodes, outputs)
+                self.record_written(step, nodes, all_nodes, outputs)
+
+    def record_written(self, step, nodes, all_nodes, outputs):
+        """
+        Record the nodes written per state column, None marks a column of which all nodes may be written
+        """
+        if not self.observers:
+            return
+        state_map = self.model.state_map
+        if outputs is None:
+            writes = step.update.writes
+            for state in writes if writes is not None else state_map:
+                if state in state_map:
+                    self.written[state_map[state]] = None
+            return
+        for state, output in outputs.items():
+            column = state_map[state]
+            if column in self.written and self.written[column] is None:
+                continue
+            if all_nodes and isinstance(output, (list, np.ndarray)):
+                self.written[column] = None
+                continue
+            written = written_nodes(nodes, output)
+            if written is not None:
+                self.written.setdefault(column, []).append(written.astype(np.int64))
+
+    def report_written(self):
+        for observer in self.observers:
+            observer.states_written(self.written)
+        self.written = {}
+
+    def report_all_written(self):
+        self.written = {column: None for column in self.model.state_map.values()}
+        self.report_written()
+
+    def close(self):
+        """
+        Shut down the thread pool, it is started again when the plan is executed
+        """
+        if self.executor:
+            self.executor.shutdown()
+            self.executor = None
+
+    def describe(self):
+        lines = []
+        for i, scheme in enumerate(self.schemes):
+            name = getattr(scheme.sample_function, '__name__', type(scheme.sample_function).__name__)
+            lines.append('Scheme {0}: {1}, iterations [{2}, {3})'.format(i, name, scheme.lower_bound, scheme.upper_bound))
+            for group in scheme.groups:
+                if len(group) > 1:
+                    lines.append('    Parallel group:')
+                for step in group:
+                    lines.append(('        ' if len(group) > 1 else '    ') + step.describe())
+        return '\n'.join(lines)
+
+    def __str__(self):
+        return self.describe()
@@ -0,0 +1,141 @@
+import copy
+
+import numpy as np
+import scipy.sparse as sp
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+class UtilityLayer(object):
+    """
+    Utility value per edge, stored as an edge array aligned with the CSR layout of a neighbor index.
+    The utility of the edge from node i to its k'th neighbor is values[indptr[i] + k],
+    edges are addressed in bulk with arrays of source and target nodes.
+    Undirected layers store both directions of every edge and keep them equal:
+    writes are mirrored to the reverse direction, and set_utility takes the utility of an edge (i, j)
+    from its direction with i <= j
+    """
+    def __init__(self, neighbor_index, initial=None, directed=True):
+        self.directed = directed
+        self.build(neighbor_index)
+        if initial is not None:
+            self.set_utility(initial)
+
+    def build(self, neighbor_index):
+        """
+        Build the edge arrays of a neighbor index, with a utility of 0 for every edge
+        """
+        self.neighbor_index = neighbor_index
+        self.n_nodes = neighbor_index.n_nodes
+        self.sources = np.repeat(np.arange(self.n_nodes), neighbor_index.degrees)
+        # Rows and the columns within every row are sorted, so the edge keys are sorted too
+        self.keys = self.sources.astype(np.int64) * self.n_nodes + neighbor_index.indices
+        self.values = np.zeros(len(self.keys))
+        # Position of the reverse direction of every edge
+        self.reverse = None if self.directed else self.edge_positions(neighbor_index.indices, self.sources)
+
+    @property
+    def targets(self):
+        return self.neighbor_index.indices
+
+    @property
+    def matrix(self):
+        """
+        Sparse NxN utility matrix sharing the edge array of the layer
+        """
+        return sp.csr_array((self.values, self.neighbor_index.indices, self.neighbor_index.indptr),
+                            shape=(self.n_nodes, self.n_nodes))
+
+    def edge_positions(self, sources, targets):
+        """
+        Positions of the given edges in the edge array
+        """
+        keys = np.asarray(sources, dtype=np.int64) * self.n_nodes + np.asarray(targets, dtype=np.int64)
+        positions = np.searchsorted(self.keys, keys)
+        positions = np.minimum(positions, len(self.keys) - 1)
+        if len(self.keys) == 0:
+            if len(keys):
+                raise ValueError('Utility can only be set for existing edges')
+            return positions
+        if np.any(self.keys[positions] != keys):
+            raise ValueError('Utility can only be set for existing edges')
+        return positions
+
+    def set_utility(self, utility):
+        """
+        Set the utility of all edges from a scalar, an edge array,
+        a dense or sparse NxN matrix, or a function of the source and target node arrays
+        """
+        if callable(utility):
+            utility = utility(self.sources, self.targets)
+        if sp.issparse(utility):
+            utility = sp.csr_array(utility)[self.sources, self.targets]
+        elif np.ndim(utility) == 2:
+            utility = np.asarray(utility)[self.sources, self.targets]
+        self.values[:] = utility
+        if not self.directed:
+            upper = self.sources <= self.targets
+            self.values[self.reverse[upper]] = self.values[upper]
+
+    def get_utility(self):
+        return self.values
+
+    def get_edges_utility(self, sources, targets):
+        return self.values[self.edge_positions(sources, targets)]
+
+    def set_edges_utility(self, sources, targets, values):
+        positions = self.edge_positions(sources, targets)
+        self.values[positions] = values
+        if not self.directed:
+            self.values[self.reverse[positions]] = values
+
+    def add_edges_utility(self, sources, targets, values):
+        """
+        Add values to the utility of edges, repeated edges are accumulated
+        """
+        positions = self.edge_positions(sources, targets)
+        np.add.at(self.values, positions, values)
+        if not self.directed:
+            # Self loops are their own reverse
+            values = np.broadcast_to(values, positions.shape)
+            loops = self.reverse[positions] == positions
+            np.add.at(self.values, self.reverse[positions[~loops]], values[~loops])
+
+    def get_nodes_utility(self, nodes):
+        """
+        Utilities of the outgoing edges of every node, as views of the edge array
+        """
+        indptr = self.neighbor_index.indptr
+        return [self.values[indptr[node]:indptr[node + 1]] for node in nodes]
+
+    def sum(self):
+        """
+        Total utility of the edges of every node
+        """
+        return np.bincount(self.sources, weights=self.values, minlength=self.n_nodes)
+
+    def mean(self):
+        """
+        Mean utility of the edges of every node, nodes without edges get a mean of 0
+        """
+        degrees = self.neighbor_index.degrees
+        return np.divide(self.sum(), degrees, out=np.zeros(self.n_nodes), where=degrees != 0)
+
+    def realign(self, neighbor_index):
+        """
+        Align the layer with a changed neighbor index, keeping the utilities of the remaining edges.
+        New edges start with a utility of 0
+        """
+        sources, targets = np.divmod(self.keys, self.n_nodes)
+        values = self.values
+        self.build(neighbor_index)
+        keys = sources * self.n_nodes + targets
+        positions = np.minimum(np.searchsorted(self.keys, keys), max(len(self.keys) - 1, 0))
+        remaining = self.keys[positions] == keys if len(self.keys) else np.zeros(len(keys), dtype=bool)
+        self.values[positions[remaining]] = values[remaining]
+
+    def copy(self):
+        layer = copy.copy(self)
+        layer.values = self.values.copy()
+        return layer
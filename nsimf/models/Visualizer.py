@@ -8,6 +8,8 @@ import matplotlib.pyplot as plt
 import matplotlib as mpl
 import matplotlib.animation as animation
 
+from nsimf.models.StateWriter import StateWriter
+
 __author__ = "Mathijs Maijer"
 __email__ = "m.f.maijer@gmail.com"
 
@@ -69,6 +71,12 @@ class Visualizer(object):
 
     @staticmethod
     def read_states_from_file(path):
+        """
+        Read saved states, binary files are memory mapped
+        while the legacy text format is parsed completely
+        """
+        if StateWriter.is_binary(path):
+            return StateWriter.read(path)
         lines = open(path, 'r').readlines()
         dimensions = make_tuple(lines[1][1:])
         return np.loadtxt(path).reshape(dimensions)
@@ -1,6 +1,9 @@
 from abc import ABCMeta, abstractmethod
 from enum import Enum
 
+import numpy as np
+import scipy.sparse as sp
+
 __author__ = "Mathijs Maijer"
 __email__ = "m.f.maijer@gmail.com"
 
@@ -11,6 +14,40 @@ class ConditionType(Enum):
     UTILITY = 2
 
 
+def row_sums(matrix, values=None):
+    """
+    Sum every row of a dense or sparse matrix,
+    or weigh the rows by values as a single matrix-vector product
+    """
+    if values is None:
+        return np.asarray(matrix.sum(axis=1)).ravel()
+    return np.asarray(matrix @ values).ravel()
+
+
+def neighbor_counts(adjacency, index=None):
+    """
+    Amount of neighbors of every node, ignoring edge weights.
+    The degrees of the neighbor index are used when it is given,
+    otherwise they are counted without comparing the whole matrix
+    """
+    if index is not None:
+        return index.degrees
+    if sp.issparse(adjacency):
+        return np.diff(sp.csr_array(adjacency != 0).indptr)
+    return np.count_nonzero(adjacency, axis=1)
+
+
+def neighbor_index(model_input):
+    """
+    Neighbor index of the model input, which is optional
+    """
+    return model_input[4] if len(model_input) > 4 else None
+
+
+def node_array(nodes):
+    return nodes if isinstance(nodes, np.ndarray) else np.fromiter(nodes, dtype=np.int64)
+
+
 class Condition(metaclass=ABCMeta):
     """
     Condition base class
@@ -31,23 +68,48 @@ class Condition(metaclass=ABCMeta):
 
     @property
     def state(self):
-        state = None
         if self.config and self.config.state:
-            state = self.config.state
-        elif self.state:
-            state = self.state
-        return state
+            return self.config.state
+        return None
+
+    def set_state_index(self, index):
+        pass
+
+    def set_state_indices(self, state_map):
+        """
+        Resolve the state indices of this condition and all conditions chained to it
+        """
+        if self.state:
+            self.set_state_index(state_map[self.state])
+        if self.chained_condition:
+            self.chained_condition.set_state_indices(state_map)
 
     def get_valid_nodes(self, model_input):
-        _, states, adjacency_matrix, utility_matrix = model_input
+        """
+        Evaluate the condition as a boolean mask over all nodes,
+        and convert it to the indices of the given nodes that satisfy it.
+        The model input is a (nodes, states, adjacency, utility) tuple, optionally followed by the neighbor index.
+        The adjacency matrix in the model input is either a dense numpy array
+        or a scipy sparse matrix, depending on the model configuration
+        """
+        nodes = model_input[0]
+        mask = self.get_mask(model_input)
+        selected = np.zeros(len(mask), dtype=bool)
+        selected[node_array(nodes)] = True
+        selected &= mask
+        return np.flatnonzero(selected)
+
+    def get_mask(self, model_input):
+        """
+        Boolean mask of the nodes satisfying this condition,
+        a chained condition is combined with a logical and
+        """
         f = self.get_function()
         args = self.get_arguments(model_input)
-
-        selected_nodes = f(*args)
-
-        return selected_nodes \
-            if not self.chained_condition \
-            else self.chained_condition.get_valid_nodes((selected_nodes, states, adjacency_matrix, utility_matrix))
+        mask = np.asarray(f(*args), dtype=bool)
+        if self.chained_condition:
+            mask &= self.chained_condition.get_mask(model_input)
+        return mask
 
     def get_function(self):
         condition_type_to_function_map = {
@@ -57,13 +119,11 @@ class Condition(metaclass=ABCMeta):
         }
         return condition_type_to_function_map[self.condition_type]
 
-    @abstractmethod
-    def test_adjacency(self):
-        pass
+    def test_adjacency(self, *args):
+        raise ValueError(type(self).__name__ + ' does not support adjacency conditions')
 
-    @abstractmethod
-    def test_utility(self):
-        pass
+    def test_utility(self, *args):
+        raise ValueError(type(self).__name__ + ' does not support utility conditions')
 
     @abstractmethod
     def test_states(self):
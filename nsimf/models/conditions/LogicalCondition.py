@@ -0,0 +1,52 @@
+from enum import Enum
+
+import numpy as np
+
+from nsimf.models.conditions.Condition import Condition
+from nsimf.models.conditions.Condition import ConditionType
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+class LogicalOperator(Enum):
+    AND = 'and'
+    OR = 'or'
+    NOT = 'not'
+
+
+class LogicalCondition(Condition):
+    """
+    Condition combining the masks of other conditions with a logical operator,
+    the NOT operator takes a single condition
+    """
+    def __init__(self, logical_operator, conditions, chained_condition=None):
+        super(LogicalCondition, self).__init__(ConditionType.STATE, chained_condition)
+        self.logical_operator = logical_operator
+        self.conditions = list(conditions)
+        self.validate()
+
+    def validate(self):
+        if not isinstance(self.logical_operator, LogicalOperator):
+            raise ValueError('Invalid logical operator')
+        if not self.conditions or not all(issubclass(type(c), Condition) for c in self.conditions):
+            raise ValueError('Logical conditions require one or more Condition subclasses')
+        if self.logical_operator == LogicalOperator.NOT and len(self.conditions) != 1:
+            raise ValueError('The NOT operator takes a single condition')
+
+    def set_state_indices(self, state_map):
+        for condition in self.conditions:
+            condition.set_state_indices(state_map)
+        super(LogicalCondition, self).set_state_indices(state_map)
+
+    def get_arguments(self, model_input):
+        return [model_input]
+
+    def test_states(self, model_input):
+        mask = self.conditions[0].get_mask(model_input)
+        if self.logical_operator == LogicalOperator.NOT:
+            return np.logical_not(mask, out=mask)
+        combine = np.logical_and if self.logical_operator == LogicalOperator.AND else np.logical_or
+        for condition in self.conditions[1:]:
+            combine(mask, condition.get_mask(model_input), out=mask)
+        return mask
@@ -2,17 +2,37 @@ import numpy as np
 
 from nsimf.models.conditions.Condition import Condition
 from nsimf.models.conditions.Condition import ConditionType
+from nsimf.models.conditions.Condition import neighbor_counts
+from nsimf.models.conditions.Condition import neighbor_index
+from nsimf.models.conditions.Condition import node_array
+from nsimf.models.conditions.Condition import row_sums
 
 __author__ = "Mathijs Maijer"
 __email__ = "m.f.maijer@gmail.com"
 
 
 class StochasticCondition(Condition):
-    def __init__(self, condition_type, p, chained_condition=None):
+    """
+    Condition that selects every node with probability p.
+    Adjacency and utility conditions give every node an independent trial with probability p
+    per neighbor, per unit of the given neighbor state, or per unit of edge utility,
+    so a node passes with probability 1 - (1 - p)^k.
+    Random numbers are only drawn for the nodes the condition is evaluated for
+    """
+    def __init__(self, condition_type, p, chained_condition=None, state=None):
         super(StochasticCondition, self).__init__(condition_type, chained_condition)
         self.probability = p
+        self.neighbor_state = state
+        self.state_index = None
         self.validate()
 
+    @property
+    def state(self):
+        return self.neighbor_state
+
+    def set_state_index(self, index):
+        self.state_index = index
+
     def validate(self):
         """
         Validate whether the state and threshold are in correct formats
@@ -21,28 +41,50 @@ class StochasticCondition(Condition):
             raise ValueError('Probability should be an integer or float')
 
     def get_arguments(self, model_input):
-        nodes, _, adjacency_matrix, utility_matrix = model_input
+        nodes, states, adjacency_matrix, utility_matrix = model_input[:4]
+        nodes = node_array(nodes)
         condition_type_to_arguments_map = {
             ConditionType.STATE: [
-                nodes
+                nodes,
+                states
             ],
             ConditionType.UTILITY: [
                 nodes,
+                states,
                 utility_matrix
             ],
             ConditionType.ADJACENCY: [
                 nodes,
-                adjacency_matrix
+                states,
+                adjacency_matrix,
+                neighbor_index(model_input)
             ]
         }
         return condition_type_to_arguments_map[self.condition_type]
 
-    def test_states(self, nodes):
-        sampled_probabilities = np.random.random(len(nodes))
-        return np.where(sampled_probabilities < self.probability)[0]
+    def test_states(self, nodes, states):
+        return self.draw(nodes, self.probability, states.shape[-2])
+
+    def test_trials(self, nodes, trials, n):
+        return self.draw(nodes, 1 - (1 - self.probability) ** trials, n)
+
+    def draw(self, nodes, probabilities, n):
+        """
+        Mask of the n nodes, in which the given nodes pass with their probabilities
+        """
+        mask = np.zeros(n, dtype=bool)
+        mask[nodes] = np.random.random(len(nodes)) < probabilities
+        return mask
 
-    def test_utility(self, nodes, utility_matrix):
-        pass
+    def test_utility(self, nodes, states, utility_matrix):
+        if utility_matrix is None:
+            raise ValueError('The model does not have a utility layer')
+        return self.test_trials(nodes, row_sums(utility_matrix)[nodes], utility_matrix.shape[0])
 
-    def test_adjacency(self, nodes, adjacency_matrix):
-        pass
+    def test_adjacency(self, nodes, states, adjacency_matrix, index=None):
+        n = adjacency_matrix.shape[0]
+        if not self.neighbor_state:
+            return self.test_trials(nodes, neighbor_counts(adjacency_matrix, index)[nodes], n)
+        if self.state_index is None:
+            raise ValueError('State index has not been set')
+        return self.test_trials(nodes, row_sums(adjacency_matrix, states[:, self.state_index])[nodes], n)
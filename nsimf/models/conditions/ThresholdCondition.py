@@ -5,6 +5,9 @@ import numpy as np
 
 from nsimf.models.conditions.Condition import Condition
 from nsimf.models.conditions.Condition import ConditionType
+from nsimf.models.conditions.Condition import neighbor_counts
+from nsimf.models.conditions.Condition import neighbor_index
+from nsimf.models.conditions.Condition import row_sums
 
 __author__ = "Mathijs Maijer"
 __email__ = "m.f.maijer@gmail.com"
@@ -17,12 +20,25 @@ class ThresholdOperator(Enum):
     LE = operator.__le__
 
 
+class ThresholdAggregate(Enum):
+    COUNT = 0
+    SUM = 1
+    MEAN = 2
+
+
 class ThresholdConfiguration(object):
-    def __init__(self, threshold_operator, threshold, state=None):
+    """
+    Threshold on a node state, or on an aggregate over the neighbors of a node.
+    Adjacency conditions count the neighbors when no state is given,
+    and sum the given state over the neighbors otherwise.
+    Utility conditions sum the utilities of the edges of a node by default
+    """
+    def __init__(self, threshold_operator, threshold, state=None, aggregate=None):
         self.threshold_operator = threshold_operator
         self.threshold = threshold
         self.state = state
         self.state_index = None
+        self.aggregate = aggregate
         self.validate()
 
     def validate(self):
@@ -31,6 +47,8 @@ class ThresholdConfiguration(object):
         """
         if not isinstance(self.threshold_operator, ThresholdOperator):
             raise ValueError('Invalid threshold type')
+        if self.aggregate is not None and not isinstance(self.aggregate, ThresholdAggregate):
+            raise ValueError('Invalid threshold aggregate')
 
 
 class ThresholdCondition(Condition):
@@ -47,35 +65,60 @@ class ThresholdCondition(Condition):
             raise ValueError('Configuration object should be of class ThresholdConfiguration')
         if self.condition_type == ConditionType.STATE and not self.config.state:
             raise ValueError('A state should be provided when using state type')
+        if self.condition_type == ConditionType.ADJACENCY and not self.config.state \
+                and self.config.aggregate not in [None, ThresholdAggregate.COUNT]:
+            raise ValueError('A state should be provided when aggregating neighbor states')
 
     def set_state_index(self, index):
         self.config.state_index = index
 
     def get_arguments(self, model_input):
-        nodes, states, adjacency_matrix, utility_matrix = model_input
+        _, states, adjacency_matrix, utility_matrix = model_input[:4]
+        index = neighbor_index(model_input)
         condition_type_to_arguments_map = {
             ConditionType.STATE: [
-                nodes,
                 states
             ],
             ConditionType.UTILITY: [
-                nodes,
-                utility_matrix
+                adjacency_matrix,
+                utility_matrix,
+                index
             ],
             ConditionType.ADJACENCY: [
-                nodes,
-                adjacency_matrix
+                states,
+                adjacency_matrix,
+                index
             ]
         }
         return condition_type_to_arguments_map[self.condition_type]
 
-    def test_states(self, nodes, states):
-        if not self.config.state_index:
-            raise ValueError('State index has not been set')
-        return np.where(self.config.threshold_operator.value(states[nodes, self.config.state_index], self.config.threshold))[0]
-
-    def test_utility(self, nodes, utility_matrix):
-        pass
+    def test(self, values):
+        return self.config.threshold_operator.value(values, self.config.threshold)
 
-    def test_adjacency(self, nodes, adjacency_matrix):
-        pass
+    def test_states(self, states):
+        if self.config.state_index is None:
+            raise ValueError('State index has not been set')
+        return self.test(states[..., self.config.state_index])
+
+    def test_utility(self, adjacency_matrix, utility_matrix, index=None):
+        if utility_matrix is None:
+            raise ValueError('The model does not have a utility layer')
+        aggregate = self.config.aggregate if self.config.aggregate else ThresholdAggregate.SUM
+        if aggregate == ThresholdAggregate.COUNT:
+            return self.test(neighbor_counts(utility_matrix))
+        values = row_sums(utility_matrix)
+        if aggregate == ThresholdAggregate.MEAN:
+            values = values / np.maximum(neighbor_counts(adjacency_matrix, index), 1)
+        return self.test(values)
+
+    def test_adjacency(self, states, adjacency_matrix, index=None):
+        default = ThresholdAggregate.SUM if self.config.state else ThresholdAggregate.COUNT
+        aggregate = self.config.aggregate if self.config.aggregate else default
+        if aggregate == ThresholdAggregate.COUNT:
+            return self.test(neighbor_counts(adjacency_matrix, index))
+        if self.config.state_index is None:
+            raise ValueError('State index has not been set')
+        values = row_sums(adjacency_matrix, states[:, self.config.state_index])
+        if aggregate == ThresholdAggregate.MEAN:
+            values = values / np.maximum(neighbor_counts(adjacency_matrix, index), 1)
+        return self.test(values)
@@ -0,0 +1,58 @@
+import unittest
+
+from nsimf.models.ArrayModel import ArrayModel
+from nsimf.models.Model import Model
+from nsimf.models.Model import ModelConfiguration
+
+import networkx as nx
+import numpy as np
+import scipy.sparse as sp
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+class ArrayModelTest(unittest.TestCase):
+    def test_from_edges(self):
+        m = ArrayModel.from_edges([0, 1, 1], [1, 2, 2], n_nodes=4)
+        self.assertIsNone(m.graph)
+        self.assertTrue(sp.issparse(m.get_adjacency()))
+        self.assertEqual(m.get_adjacency().format, 'csr')
+        self.assertEqual(m.get_n_nodes(), 4)
+        self.assertEqual(list(m.nodes), [0, 1, 2, 3])
+        self.assertEqual(list(m.get_neighbors(1)), [0, 2])
+        self.assertEqual(list(m.get_neighbor_index().degrees), [1, 2, 1, 0])
+        self.assertEqual(sorted(m.get_graph().edges), [(0, 1), (1, 2)])
+
+        directed = ArrayModel.from_edges([0, 1], [1, 2], directed=True)
+        self.assertEqual(list(directed.get_neighbor_index().degrees), [1, 1, 0])
+
+        # The format of the configuration is kept, dense only when it is requested
+        self.assertTrue(sp.issparse(ArrayModel.from_edges([0], [1], config=ModelConfiguration()).get_adjacency()))
+        dense = ArrayModel.from_edges([0], [1], config=ModelConfiguration({'adjacency_format': 'dense'}))
+        self.assertIsInstance(dense.get_adjacency(), np.ndarray)
+
+    def test_simulation(self):
+        graph = nx.watts_strogatz_graph(50, 4, 0.1, seed=1)
+        outputs = []
+        for create in [Model, ArrayModel.from_networkx]:
+            m = create(graph, ModelConfiguration({'adjacency_format': 'csr'}), seed=1)
+            m.set_states(['A'])
+            m.set_initial_state({'A': lambda: np.random.random(50)})
+            m.add_update(lambda model: {'A': model.get_neighbors_mean('A')}, {'model': m})
+            outputs.append(m.simulate(5, show_tqdm=False))
+        self.assertTrue(np.allclose(outputs[0], outputs[1]))
+
+    def test_mutations(self):
+        m = ArrayModel.from_edges([0, 1], [1, 2])
+        m.set_states(['A'])
+        m.add_update(lambda nodes: {'A': np.ones(len(nodes))}, get_nodes=True)
+        m.remove_nodes([1])
+        nodes = m.add_nodes(1)
+        m.add_edges([0], nodes)
+        m.simulate(1, show_tqdm=False)
+
+        self.assertEqual(list(m.nodes), [0, 2, 3])
+        self.assertEqual(list(m.get_state('A')), [1, 0, 1, 1])
+        self.assertEqual(list(m.get_neighbors(0)), [3])
+        self.assertEqual(sorted(m.get_graph().nodes), [0, 2, 3])
@@ -1,12 +1,17 @@
 import unittest
 
+import networkx as nx
 import numpy as np
 
 from nsimf.models.conditions.StochasticCondition import StochasticCondition
 from nsimf.models.conditions.ThresholdCondition import ThresholdCondition
 from nsimf.models.conditions.ThresholdCondition import ThresholdOperator
+from nsimf.models.conditions.ThresholdCondition import ThresholdAggregate
 from nsimf.models.conditions.ThresholdCondition import ThresholdConfiguration
+from nsimf.models.conditions.LogicalCondition import LogicalCondition
+from nsimf.models.conditions.LogicalCondition import LogicalOperator
 from nsimf.models.conditions.Condition import ConditionType
+from nsimf.models.NeighborIndex import NeighborIndex
 
 __author__ = "Mathijs Maijer"
 __email__ = "m.f.maijer@gmail.com"
@@ -32,6 +37,17 @@ class ConditionsTest(unittest.TestCase):
 
         self.assertEqual(list(nodes), [1, 9, 12])
 
+    def test_stochastic_candidates(self):
+        states = np.ones((1000, 1))
+        s = StochasticCondition(ConditionType.STATE, 1.)
+        np.random.seed(1337)
+        self.assertEqual(list(s.get_valid_nodes(([3, 7], states, None, None))), [3, 7])
+        # Only the two candidate nodes drew a random number
+        after = np.random.random()
+        np.random.seed(1337)
+        np.random.random(2)
+        self.assertEqual(after, np.random.random())
+
     def test_chained_conditions(self):
         np.random.seed(1337)
         states = np.random.random((100, 3))
@@ -43,4 +59,89 @@ class ConditionsTest(unittest.TestCase):
         c = StochasticCondition(ConditionType.STATE, 0.25, t)
         nodes = c.get_valid_nodes((list(range(len(states))), states, None, None))
 
-        self.assertEqual(list(nodes), [1,2,3,4,9,11,12,15,17,22])
+        self.assertEqual(list(nodes), [6, 10, 12, 22, 39, 42, 48, 62, 79, 90])
+
+    def test_chained_node_ids(self):
+        states = np.array([[0, 1], [1, 0], [1, 1], [1, 1]])
+        first = ThresholdCondition(ConditionType.STATE, ThresholdConfiguration(ThresholdOperator.GE, 1, 'A'))
+        second = ThresholdCondition(ConditionType.STATE, ThresholdConfiguration(ThresholdOperator.GE, 1, 'B'), first)
+        second.set_state_indices({'A': 0, 'B': 1})
+
+        self.assertEqual(first.config.state_index, 0)
+        self.assertEqual(list(second.get_valid_nodes((np.array([0, 2, 3]), states, None, None))), [2, 3])
+        self.assertEqual(list(second.get_valid_nodes(([1, 3], states, None, None))), [3])
+
+    def test_logical_conditions(self):
+        states = np.array([[0, 1], [1, 0], [1, 1], [0, 0]])
+        a = ThresholdCondition(ConditionType.STATE, ThresholdConfiguration(ThresholdOperator.GE, 1, 'A'))
+        b = ThresholdCondition(ConditionType.STATE, ThresholdConfiguration(ThresholdOperator.GE, 1, 'B'))
+        nodes = np.arange(4)
+
+        either = LogicalCondition(LogicalOperator.OR, [a, b])
+        either.set_state_indices({'A': 0, 'B': 1})
+        self.assertEqual(list(either.get_valid_nodes((nodes, states, None, None))), [0, 1, 2])
+
+        both = LogicalCondition(LogicalOperator.AND, [a, b])
+        self.assertEqual(list(both.get_valid_nodes((nodes, states, None, None))), [2])
+
+        neither = LogicalCondition(LogicalOperator.NOT, [either])
+        self.assertEqual(list(neither.get_valid_nodes((nodes, states, None, None))), [3])
+
+        with self.assertRaises(ValueError):
+            LogicalCondition(LogicalOperator.NOT, [a, b])
+        with self.assertRaises(ValueError):
+            either.test_adjacency(states, None)
+
+    def test_adjacency_conditions(self):
+        graph = nx.star_graph(4)
+        graph.add_edge(1, 2)
+        states = np.array([[1], [0], [1], [1], [0]])
+        nodes = np.arange(5)
+
+        for adjacency in [nx.to_numpy_array(graph), nx.to_scipy_sparse_array(graph, format='csr')]:
+            count = ThresholdCondition(ConditionType.ADJACENCY, ThresholdConfiguration(ThresholdOperator.GE, 2))
+            self.assertEqual(list(count.get_valid_nodes((nodes, states, adjacency, None))), [0, 1, 2])
+
+            cfg = ThresholdConfiguration(ThresholdOperator.GE, 1, 'A')
+            total = ThresholdCondition(ConditionType.ADJACENCY, cfg)
+            total.set_state_indices({'A': 0})
+            self.assertEqual(list(total.get_valid_nodes((nodes, states, adjacency, None))), [0, 1, 2, 3, 4])
+
+            cfg = ThresholdConfiguration(ThresholdOperator.GT, 0.5, 'A', ThresholdAggregate.MEAN)
+            mean = ThresholdCondition(ConditionType.ADJACENCY, cfg)
+            mean.set_state_indices({'A': 0})
+            self.assertEqual(list(mean.get_valid_nodes((nodes, states, adjacency, None))), [1, 3, 4])
+
+    def test_neighbor_index_degrees(self):
+        index = NeighborIndex(nx.to_scipy_sparse_array(nx.star_graph(4), format='csr'))
+        count = ThresholdCondition(ConditionType.ADJACENCY, ThresholdConfiguration(ThresholdOperator.GE, 2))
+        # The degrees are taken from the neighbor index, without reading the adjacency matrix
+        self.assertEqual(list(count.get_valid_nodes((np.arange(5), None, None, None, index))), [0])
+
+        stochastic = StochasticCondition(ConditionType.ADJACENCY, 1.)
+        self.assertEqual(list(stochastic.get_valid_nodes((np.arange(5), None, np.zeros((5, 5)), None, index))),
+                         [0, 1, 2, 3, 4])
+
+    def test_utility_conditions(self):
+        adjacency = nx.to_scipy_sparse_array(nx.path_graph(3), format='csr')
+        utility = adjacency * np.array([[0.5, 0.5, 2]])
+        cfg = ThresholdConfiguration(ThresholdOperator.GE, 1)
+        condition = ThresholdCondition(ConditionType.UTILITY, cfg)
+
+        self.assertEqual(list(condition.get_valid_nodes((np.arange(3), None, adjacency, utility))), [1])
+        with self.assertRaises(ValueError):
+            condition.get_valid_nodes((np.arange(3), None, adjacency, None))
+
+    def test_stochastic_adjacency_condition(self):
+        np.random.seed(1337)
+        adjacency = nx.to_scipy_sparse_array(nx.star_graph(999), format='csr')
+        states = np.zeros((1000, 1))
+
+        condition = StochasticCondition(ConditionType.ADJACENCY, 0.5, state='A')
+        condition.set_state_indices({'A': 0})
+        self.assertEqual(len(condition.get_valid_nodes((np.arange(1000), states, adjacency, None))), 0)
+
+        states[:, 0] = 1
+        nodes = condition.get_valid_nodes((np.arange(1000), states, adjacency, None))
+        self.assertEqual(nodes[0], 0)
+        self.assertTrue(400 < len(nodes) < 600)
@@ -0,0 +1,90 @@
+import unittest
+
+from nsimf.models.Model import Model
+from nsimf.models.EnsembleModel import EnsembleModel
+from nsimf.models.Scheme import Scheme
+from nsimf.models.Sampler import WeightedSampler
+
+import networkx as nx
+import numpy as np
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+def neighbor_sum(nodes, states, new_states, indptr, indices, constants):
+    for node in nodes:
+        total = 0.0
+        for i in range(indptr[node], indptr[node + 1]):
+            total += states[indices[i], 0]
+        new_states[node, 1] = total * constants[0]
+
+
+def build(model, a):
+    model.constants = {'a': a, 'b': 0.1}
+    model.set_states(['A', 'B'])
+
+    def update_A(constants):
+        return {'A': model.get_state('A') * constants['b'] + model.get_neighbors_mean('B') + constants['a']}
+
+    def update_B(constants):
+        return {'B': model.get_state('A') - model.get_state('B')}
+
+    model.add_update(update_A, {'constants': model.constants})
+    model.add_update(update_B, {'constants': model.constants})
+    model.set_initial_state({'A': 1, 'B': lambda: np.arange(5)})
+    return model
+
+
+class EnsembleModelTest(unittest.TestCase):
+    def test_ensemble(self):
+        g = nx.cycle_graph(5)
+        ensemble = build(EnsembleModel(g, 3), [0.1, 0.2, 0.3])
+        self.assertEqual(ensemble.node_states.shape, (3, 5, 2))
+        self.assertEqual(ensemble.constants['a'].shape, (3, 1))
+
+        output = ensemble.simulate(4, show_tqdm=False)
+        self.assertEqual(output.shape, (4, 3, 5, 2))
+
+        for replica, a in enumerate([0.1, 0.2, 0.3]):
+            single = build(Model(g), a).simulate(4, show_tqdm=False)
+            self.assertTrue(np.allclose(output[:, replica], single))
+
+    def test_conditions_unsupported(self):
+        ensemble = EnsembleModel(nx.cycle_graph(5), 2)
+        with self.assertRaises(ValueError):
+            ensemble.add_update(lambda: {}, condition=object())
+        with self.assertRaises(ValueError):
+            ensemble.add_kernel(lambda: None, condition=object())
+
+    def test_kernels(self):
+        ensemble = EnsembleModel(nx.path_graph(4), 5)
+        ensemble.constants = {'a': [1, 2, 3, 4, 5]}
+        ensemble.set_states(['A', 'B'])
+        ensemble.set_initial_state({'A': lambda: np.arange(4)})
+        ensemble.add_kernel(neighbor_sum, ensemble.constants)
+        ensemble.simulate(1, show_tqdm=False)
+
+        self.assertTrue(np.array_equal(ensemble.get_state('A'), np.tile(np.arange(4), (5, 1))))
+        for replica in range(5):
+            self.assertEqual(list(ensemble.get_state('B')[replica]), [(replica + 1) * b for b in [1, 2, 4, 2]])
+
+    def test_weighted_sampler_unsupported(self):
+        ensemble = EnsembleModel(nx.path_graph(4), 2)
+        ensemble.set_states(['A'])
+        with self.assertRaises(ValueError):
+            ensemble.add_scheme(Scheme(WeightedSampler(ensemble, 'A')))
+
+    def test_independent_replicas(self):
+        ensemble = EnsembleModel(nx.cycle_graph(5), 3, seed=1)
+        ensemble.set_states(['A'])
+        self.assertEqual(ensemble.get_state_shape(), (3, 5))
+        ensemble.set_initial_state({'A': lambda: np.random.random(ensemble.get_state_shape())})
+        ensemble.add_update(lambda: {'A': ensemble.get_state('A') + np.random.normal(size=ensemble.get_state_shape())})
+        output = ensemble.simulate(2, show_tqdm=False)
+        self.assertFalse(np.allclose(output[:, 0], output[:, 1]))
+        self.assertFalse(np.allclose(output[:, 1], output[:, 2]))
+
+        # Values drawn per node are shared by the replicas
+        ensemble.set_initial_state({'A': lambda: np.random.random(5)})
+        self.assertTrue(np.array_equal(ensemble.get_replica(0), ensemble.get_replica(2)))
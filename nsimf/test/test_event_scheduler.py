@@ -0,0 +1,125 @@
+import unittest
+
+from nsimf.models.Model import Model
+from nsimf.models.Model import ModelConfiguration
+from nsimf.models.PropertyFunction import PropertyFunction
+from nsimf.models.Sampler import WeightedSampler
+from nsimf.models.Scheme import Scheme
+from nsimf.models.Update import Update
+from nsimf.models.EventScheduler import EventScheduler
+from nsimf.models.SharedStates import SharedStatesReader
+
+import networkx as nx
+import numpy as np
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+class EventSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(1337)
+        self.model = Model(nx.path_graph(10))
+        self.model.set_states(['A', 'rate'])
+
+    def test_node_events(self):
+        def increase(nodes):
+            return {'A': self.model.get_nodes_state(nodes, 'A') + 1}
+
+        scheduler = EventScheduler(self.model)
+        scheduler.add_node_event(Update(increase, get_nodes=True), 1)
+        output = scheduler.simulate(10, 0.5, show_tqdm=False)
+
+        self.assertEqual(output.shape, (20, 10, 2))
+        self.assertTrue(np.all(np.diff(output[:, :, 0].sum(axis=1)) >= 0))
+        self.assertEqual(scheduler.time, 10)
+        self.assertEqual(self.model.current_iteration, self.model.get_state('A').sum())
+
+    def test_state_rates(self):
+        def activate(nodes):
+            return {'A': [1], 'rate': [0]}
+
+        self.model.node_states[3, 1] = 2
+        scheduler = EventScheduler(self.model)
+        scheduler.add_node_event(Update(activate, get_nodes=True), 'rate')
+        scheduler.simulate(100, 10, show_tqdm=False)
+
+        self.assertEqual(list(np.flatnonzero(self.model.get_state('A'))), [3])
+        self.assertEqual(self.model.current_iteration, 1)
+        self.assertEqual(scheduler.events[0].total, 0)
+
+    def test_scheme_events(self):
+        scheme = Scheme(lambda: np.arange(10), updates=[Update(lambda: {'A': self.model.get_state('A') + 1})])
+        scheduler = EventScheduler(self.model)
+        scheduler.add_scheme_event(scheme, 2)
+        scheduler.simulate(5, 1, show_tqdm=False)
+        self.assertEqual(self.model.get_state('A')[0], self.model.current_iteration)
+        with self.assertRaises(ValueError):
+            scheduler.add_node_event(Update(lambda: {}), 1)
+
+    def test_weighted_scheme_events(self):
+        model = Model(nx.cycle_graph(4))
+        model.set_states(['W'])
+        model.node_states[0, 0] = 1
+
+        def move(nodes):
+            # Move the weight of the sampled node to the next node
+            return {'W': (np.concatenate((nodes, (nodes + 1) % 4)),
+                          np.concatenate((np.zeros(len(nodes)), model.get_nodes_state(nodes, 'W'))))}
+
+        scheme = Scheme(WeightedSampler(model, 'W'), updates=[Update(move, get_nodes=True)])
+        scheduler = EventScheduler(model)
+        scheduler.add_scheme_event(scheme, 1)
+        output = scheduler.simulate(20, 1, show_tqdm=False)
+
+        self.assertGreater(model.current_iteration, 4)
+        self.assertEqual(model.get_state('W').sum(), 1)
+        self.assertEqual(model.get_state('W')[model.current_iteration % 4], 1)
+        self.assertGreater(len(np.unique(output[:, :, 0].argmax(axis=1))), 2)
+
+    def test_properties(self):
+        def increase(nodes):
+            return {'A': self.model.get_nodes_state(nodes, 'A') + 1}
+
+        def total(model, previous, changed):
+            self.assertTrue(changed is None or np.all(self.model.get_state('A')[changed] > 0))
+            return model.get_state('A').sum()
+
+        self.model.add_property_function(PropertyFunction('sum', lambda model: model.get_state('A').sum(), 2,
+                                                          {'model': self.model}))
+        self.model.add_property_function(PropertyFunction('total', total, 1, {'model': self.model},
+                                                          incremental=True))
+        scheduler = EventScheduler(self.model)
+        scheduler.add_node_event(Update(increase, get_nodes=True), 1)
+        scheduler.simulate(10, 1, show_tqdm=False)
+        output = scheduler.simulate(4, 1, show_tqdm=False)
+
+        # Property intervals count snapshots, not events
+        self.assertEqual(scheduler.snapshots, 14)
+        properties = self.model.get_properties()
+        self.assertEqual(len(properties['sum']), 7)
+        self.assertEqual(len(properties['total']), 14)
+        self.assertEqual(properties['total'][-1], output[-1, :, 0].sum())
+        self.assertEqual(list(properties['sum']), list(properties['total'][::2]))
+
+    def test_memory_interval(self):
+        self.model.config.memory_interval = 3
+        scheduler = EventScheduler(self.model)
+        scheduler.add_node_event(Update(lambda nodes: {'A': [1]}, get_nodes=True), 1)
+        self.assertEqual(scheduler.simulate(10, 1, show_tqdm=False).shape, (3, 10, 2))
+        self.assertEqual(scheduler.simulate(2, 1, show_tqdm=False).shape, (1, 10, 2))
+
+    def test_shared_states(self):
+        model = Model(nx.path_graph(10), ModelConfiguration({'shared_memory': True}))
+        model.set_states(['A'])
+        reader = SharedStatesReader(model.get_shared_handle())
+        try:
+            scheduler = EventScheduler(model)
+            scheduler.add_node_event(Update(lambda nodes: {'A': [1]}, get_nodes=True), 1)
+            scheduler.simulate(5, 1, show_tqdm=False)
+            self.assertEqual(reader.iteration, model.current_iteration)
+            self.assertEqual(len(reader.get_history()), 5)
+            self.assertTrue(np.array_equal(reader.get_state('A'), model.get_state('A')))
+        finally:
+            reader.close()
+            model.release_shared_memory()
@@ -0,0 +1,55 @@
+import unittest
+
+from nsimf.models.Model import Model
+from nsimf.models.Kernel import KernelUpdate
+
+import networkx as nx
+import numpy as np
+import pytest
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+def neighbor_sum(nodes, states, new_states, indptr, indices, constants):
+    for node in nodes:
+        total = 0.0
+        for i in range(indptr[node], indptr[node + 1]):
+            total += states[indices[i], 0]
+        new_states[node, 1] = total * constants[0]
+
+
+def random_walk(nodes, states, new_states, indptr, indices, constants):
+    for node in nodes:
+        new_states[node, 0] = states[node, 0] + np.random.random()
+
+
+class KernelTest(unittest.TestCase):
+    def test_kernel_update(self):
+        m = Model(nx.path_graph(4))
+        m.constants = {'b': 1, 'a': 2}
+        m.set_states(['A', 'B'])
+        m.set_initial_state({'A': lambda: np.arange(4)})
+        update = m.add_kernel(neighbor_sum, m.constants, names=['a'])
+        m.simulate(1, show_tqdm=False)
+        self.assertIsInstance(update, KernelUpdate)
+        self.assertEqual(list(m.get_state('B')), [2, 4, 8, 4])
+
+    def test_python_fallback(self):
+        update = KernelUpdate(neighbor_sum, {'a': 3}, jit=False)
+        self.assertFalse(update.compiled)
+        self.assertEqual(list(update.get_constants()), [3])
+        with self.assertRaises(ValueError):
+            update.execute([0])
+
+    def test_seeded_jit(self):
+        pytest.importorskip('numba')
+        outputs = []
+        for jit in [True, False]:
+            m = Model(nx.path_graph(5), seed=1337)
+            m.set_states(['A'])
+            update = KernelUpdate(random_walk, jit=jit)
+            m.schemes[0].add_update(update)
+            outputs.append(m.simulate(3, show_tqdm=False))
+            self.assertEqual(update.compiled, jit)
+        self.assertTrue(np.allclose(outputs[0], outputs[1]))
@@ -1,6 +1,10 @@
 import unittest
 
 from nsimf.models.Model import Model
+from nsimf.models.Model import ModelConfiguration
+from nsimf.models.Model import ConfigurationException
+from nsimf.models.Scheme import Scheme
+from nsimf.models.Update import Update
 
 import networkx as nx
 import numpy as np
@@ -13,7 +17,7 @@ class ModelTest(unittest.TestCase):
     def test_model_init(self):
         g = nx.random_geometric_graph(10, 0.1)
         m = Model(g)
-        self.assertEqual(len(m.__dict__.keys()), 10)
+        self.assertEqual(len(m.__dict__.keys()), 17)
 
     def test_model_constants(self):
         g = nx.random_geometric_graph(10, 0.1)
@@ -29,3 +33,89 @@ class ModelTest(unittest.TestCase):
         self.assertTrue((np.zeros((10, 2)) == m.node_states).any())
         self.assertEqual(m.state_names, ['1', '2'])
         self.assertEqual(m.state_map, {'1': 0, '2': 1})
+
+    def test_sparse_adjacency(self):
+        g = nx.path_graph(5)
+        m = Model(g, ModelConfiguration({'adjacency_format': 'csr'}))
+        self.assertTrue(m.has_sparse_adjacency())
+        self.assertEqual(m.get_adjacency().nnz, 8)
+        self.assertEqual(list(m.get_neighbors(2)), [1, 3])
+        m.set_states(['A'])
+        m.set_initial_state({'A': np.arange(5)})
+        self.assertEqual(list(m.get_neighbors_sum('A')), [1, 2, 4, 6, 3])
+
+    def test_invalid_adjacency_format(self):
+        with self.assertRaises(ConfigurationException):
+            ModelConfiguration({'adjacency_format': 'coo'})
+
+    def test_synchronous_iteration(self):
+        g = nx.path_graph(3)
+        m = Model(g)
+        m.set_states(['A', 'B'])
+        m.set_initial_state({'A': 1, 'B': 0})
+        m.add_update(lambda: {'A': m.get_state('A') * 2})
+        m.add_update(lambda: {'B': m.get_state('A')})
+        output = m.simulate(3, show_tqdm=False)
+        self.assertEqual(output.shape, (3, 3, 2))
+        self.assertEqual(list(output[:, 0, 0]), [2, 4, 8])
+        self.assertEqual(list(output[:, 0, 1]), [1, 2, 4])
+        self.assertEqual(list(m.get_previous_nodes_states(1)[:, 0]), [4, 4, 4])
+
+    def test_iteration_copies(self):
+        m = Model(nx.path_graph(3))
+        m.set_states(['A'])
+        m.add_update(lambda: {'A': m.get_state('A') + 1})
+        first = m.iteration()
+        second = m.iteration()
+        m.iteration()
+        self.assertEqual(list(first[:, 0]), [1, 1, 1])
+        self.assertEqual(list(second[:, 0]), [2, 2, 2])
+
+    def test_state_memory(self):
+        g = nx.path_graph(3)
+        m = Model(g, ModelConfiguration({'state_memory': 2}))
+        m.set_states(['A'])
+        m.add_update(lambda: {'A': m.get_state('A') + 1})
+        output = m.simulate(5, show_tqdm=False)
+        self.assertEqual(list(output[:, 0, 0]), [4, 5])
+        self.assertEqual(m.get_previous_nodes_states(1)[0, 0], 4)
+
+    def test_clone(self):
+        g = nx.path_graph(3)
+        m = Model(g)
+        m.constants = {'a': 1}
+        m.set_states(['A'])
+
+        def update(model, constants):
+            return {'A': model.get_state('A') + constants['a']}
+
+        m.add_update(update, {'model': m, 'constants': m.constants})
+        clone = m.clone()
+        clone.constants['a'] = 2
+        output = clone.simulate(2, show_tqdm=False)
+
+        self.assertIs(clone.graph, m.graph)
+        self.assertIs(clone.neighbor_index, m.neighbor_index)
+        self.assertEqual(list(output[:, 0, 0]), [2, 4])
+        self.assertEqual(m.constants['a'], 1)
+        self.assertEqual(list(m.get_state('A')), [0, 0, 0])
+        self.assertEqual(m.current_iteration, 0)
+
+    def test_compile(self):
+        g = nx.path_graph(3)
+        m = Model(g)
+        m.set_states(['A'])
+
+        def increase(nodes):
+            return {'A': {node: 1 for node in nodes}}
+
+        m.add_scheme(Scheme(lambda: [1], lower_bound=2, upper_bound=4, updates=[Update(increase, get_nodes=True)]))
+        m.add_update(lambda: {'A': m.get_state('A') + 1})
+        plan = m.compile()
+        self.assertEqual(plan.schemes[1].lower_bound, 2)
+        self.assertEqual(plan.schemes[1].upper_bound, 4)
+
+        output = m.simulate(5, show_tqdm=False)
+        self.assertEqual(list(output[:, 1, 0]), [1, 2, 1, 1, 2])
+        self.assertIn('write_all', str(m.plan))
+        self.assertIn('increase(get_nodes=True, condition=None, writers=[A: write_dict])', str(m.plan))
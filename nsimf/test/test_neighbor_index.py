@@ -0,0 +1,44 @@
+import unittest
+
+from nsimf.models.NeighborIndex import NeighborIndex
+
+import networkx as nx
+import numpy as np
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+class NeighborIndexTest(unittest.TestCase):
+    def setUp(self):
+        g = nx.star_graph(3)
+        g.add_node(4)
+        self.index = NeighborIndex(nx.to_numpy_array(g))
+
+    def test_neighbors(self):
+        self.assertEqual(list(self.index.neighbors(0)), [1, 2, 3])
+        self.assertEqual(list(self.index.neighbors(4)), [])
+        self.assertEqual(list(self.index.degrees), [3, 1, 1, 1, 0])
+        self.assertEqual(len(self.index.all_neighbors()), 5)
+
+    def test_sample(self):
+        np.random.seed(1337)
+        sampled = self.index.sample([0, 1, 3])
+        self.assertTrue(sampled[0] in [1, 2, 3])
+        self.assertEqual(list(sampled[1:]), [0, 0])
+
+    def test_sample_isolated(self):
+        with self.assertRaises(ValueError):
+            self.index.sample()
+        with self.assertRaises(ValueError):
+            self.index.sample([1, 4])
+
+        sampled, has_neighbors = self.index.sample(mask=True)
+        self.assertEqual(list(has_neighbors), [True, True, True, True, False])
+        self.assertEqual(list(sampled[1:4]), [0, 0, 0])
+        self.assertEqual(sampled[4], -1)
+
+    def test_sum_mean(self):
+        values = np.array([1., 2., 3., 4., 5.])
+        self.assertEqual(list(self.index.sum(values)), [9, 1, 1, 1, 0])
+        self.assertEqual(list(self.index.mean(values)), [3, 1, 1, 1, 0])
@@ -0,0 +1,98 @@
+import multiprocessing as mp
+import threading
+import unittest
+
+from nsimf.models.Model import Model
+from nsimf.models.Model import ModelConfiguration
+from nsimf.models.NetworkMutations import resize_rows
+
+import networkx as nx
+import numpy as np
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+class NetworkMutationsTest(unittest.TestCase):
+    def test_resize_rows(self):
+        states = np.ones((3, 2))
+        grown = resize_rows(states, 4)
+        self.assertEqual(grown.shape, (4, 2))
+        self.assertEqual(grown.base.shape, (6, 2))
+        self.assertEqual(list(grown[:, 0]), [1, 1, 1, 0])
+        # Growing within the capacity reuses the buffer
+        self.assertIs(resize_rows(grown, 6).base, grown.base)
+
+    def test_edge_mutations(self):
+        for adjacency_format in ['dense', 'csr']:
+            m = Model(nx.path_graph(4), ModelConfiguration({'adjacency_format': adjacency_format}))
+            m.add_edges([0, 0], [3, 2], [2, 1])
+            m.remove_edges([1], [2])
+            m.apply_mutations()
+
+            self.assertEqual(sorted(m.graph.edges), [(0, 1), (0, 2), (0, 3), (2, 3)])
+            self.assertEqual(list(m.get_neighbor_index().neighbors(0)), [1, 2, 3])
+            self.assertEqual(list(m.get_neighbor_index().neighbors(3)), [0, 2])
+            self.assertTrue(np.array_equal(m.get_neighbor_index().matrix.toarray(), nx.to_numpy_array(m.graph)))
+
+    def test_simulation_mutations(self):
+        m = Model(nx.path_graph(3), ModelConfiguration({'adjacency_format': 'csr'}))
+        m.set_states(['A'])
+        m.add_utility_layer(1)
+
+        def grow(model):
+            node = model.add_nodes(1, {'A': 1})[0]
+            model.add_edges([node - 1], [node])
+            return {'A': model.get_state('A') + 1}
+
+        m.add_update(grow, {'model': m})
+        output = m.simulate(3, show_tqdm=False)
+
+        self.assertEqual(m.get_n_nodes(), 6)
+        self.assertEqual(list(m.get_state('A')), [3, 3, 3, 3, 2, 1])
+        self.assertEqual(output.shape, (3, 6, 1))
+        self.assertTrue(np.isnan(output[0, 4, 0]))
+        self.assertEqual(list(m.get_neighbor_index().neighbors(5)), [4])
+        self.assertEqual(list(m.get_utility_layer().get_utility()), [1, 1, 1, 1, 0, 0, 0, 0, 0, 0])
+
+    def test_remove_nodes(self):
+        m = Model(nx.star_graph(3))
+        m.set_states(['A'])
+        clone = m.clone()
+        clone.remove_nodes([0])
+        clone.add_update(lambda nodes: {'A': np.ones(len(nodes))}, get_nodes=True)
+        clone.simulate(1, show_tqdm=False)
+
+        self.assertEqual(list(clone.graph.nodes), [1, 2, 3])
+        self.assertEqual(len(m.graph.nodes), 4)
+        self.assertEqual(list(clone.get_neighbor_index().degrees), [0, 0, 0, 0])
+        self.assertEqual(list(clone.get_state('A')), [0, 1, 1, 1])
+
+    def test_plans_closed(self):
+        threads = threading.active_count()
+        m = Model(nx.path_graph(4), ModelConfiguration({'update_threads': 2}))
+        m.set_states(['A', 'B'])
+        plans = []
+
+        def update_a():
+            plans.append(m.plan)
+            m.add_edges([0], [m.current_iteration % 4])
+            return {'A': m.get_state('A') + 1}
+
+        m.add_update(update_a, reads=['A'], writes=['A'])
+        m.add_update(lambda: {'B': m.get_state('B') + 1}, reads=['B'], writes=['B'])
+        m.simulate(3, show_tqdm=False)
+        self.assertEqual(list(m.node_states[0]), [3, 3])
+        # Every iteration mutates the network and recompiles the plan
+        self.assertEqual(len(set(map(id, plans))), 3)
+        self.assertTrue(all(plan.executor is None for plan in plans))
+        self.assertEqual(threading.active_count(), threads)
+
+        m = Model(nx.path_graph(10), ModelConfiguration({'processes': 2}))
+        m.set_states(['A'])
+        m.add_update(lambda nodes: {'A': np.ones(len(nodes))}, get_nodes=True)
+        m.simulate(1, show_tqdm=False)
+        m.add_edges([0], [5])
+        m.simulate(1, show_tqdm=False)
+        m.add_update(lambda nodes: {'A': np.ones(len(nodes))}, get_nodes=True)
+        self.assertEqual(mp.active_children(), [])
@@ -0,0 +1,57 @@
+import unittest
+
+from nsimf.models.ArrayModel import ArrayModel
+from nsimf.models.Model import Model
+from nsimf.models.Model import ModelConfiguration
+from nsimf.models.Partition import edge_cut
+from nsimf.models.Partition import partition_nodes
+from nsimf.models.PartitionedPlan import PartitionedPlan
+
+import networkx as nx
+import numpy as np
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+class PartitionedPlanTest(unittest.TestCase):
+    def test_partition(self):
+        graph = nx.grid_2d_graph(20, 20)
+        adjacency = nx.to_scipy_sparse_array(graph)
+        parts = partition_nodes(adjacency, 4)
+
+        self.assertEqual(list(np.bincount(parts)), [100, 100, 100, 100])
+        random_parts = np.random.default_rng(1).permutation(parts)
+        self.assertLess(edge_cut(adjacency, parts), edge_cut(adjacency, random_parts) / 4)
+
+    def test_partitioned_simulation(self):
+        graph = nx.watts_strogatz_graph(200, 4, 0.1, seed=1)
+        outputs = []
+        for processes in [1, 3]:
+            m = ArrayModel.from_networkx(graph, ModelConfiguration({'adjacency_format': 'csr', 'processes': processes}))
+            m.set_states(['A', 'B'])
+            m.set_initial_state({'A': np.arange(200.)})
+
+            def update(nodes, model):
+                return {'A': model.get_neighbors_mean('A')[nodes], 'B': model.get_nodes_state(nodes, 'B') + 1}
+
+            m.add_update(update, {'model': m}, get_nodes=True)
+            outputs.append(m.simulate(5, show_tqdm=False))
+
+        self.assertIsInstance(m.plan, PartitionedPlan)
+        self.assertEqual(m.plan.workers, [])
+
+        self.assertTrue(np.allclose(outputs[0], outputs[1]))
+
+    def test_errors(self):
+        m = Model(nx.path_graph(10), ModelConfiguration({'processes': 2}))
+        m.set_states(['A'])
+        m.add_update(lambda: {'A': np.ones(10)})
+        with self.assertRaises(ValueError):
+            m.simulate(1, show_tqdm=False)
+
+        m = Model(nx.path_graph(10), ModelConfiguration({'processes': 2}))
+        m.set_states(['A'])
+        m.add_update(lambda nodes: {'A': 1 / 0}, get_nodes=True)
+        with self.assertRaises(RuntimeError):
+            m.simulate(1, show_tqdm=False)
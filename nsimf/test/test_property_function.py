@@ -0,0 +1,112 @@
+import unittest
+from unittest import mock
+
+from nsimf.models.Model import Model
+from nsimf.models.PropertyFunction import PropertyFunction
+from nsimf.models.PropertyFunction import sample_size
+
+import networkx as nx
+import numpy as np
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+class PropertyFunctionTest(unittest.TestCase):
+    def setUp(self):
+        self.model = Model(nx.path_graph(4))
+        self.model.set_states(['A'])
+
+        def update(nodes):
+            return {'A': ([0], np.ones(1))}
+
+        self.model.add_update(update, get_nodes=True)
+
+    def test_preallocated(self):
+        prop = PropertyFunction('sum', lambda model: model.get_state('A').sum(), 2, {'model': self.model})
+        self.model.add_property_function(prop)
+        self.model.simulate(5, show_tqdm=False)
+
+        self.assertEqual(len(prop.values), 3)
+        self.assertEqual(prop.values.dtype, np.float64)
+        self.assertEqual(list(self.model.get_properties()['sum']), [1, 1, 1])
+
+        self.model.iteration()
+        self.model.iteration()
+        self.assertEqual(list(self.model.get_properties()['sum']), [1, 1, 1, 1])
+
+    def test_incremental(self):
+        calls = []
+
+        def count(model, previous, changed):
+            calls.append(None if changed is None else list(changed))
+            return model.get_state('A').sum() if previous is None else previous + len(changed)
+
+        def update(nodes, model):
+            return {'A': ([model.current_iteration], np.ones(1))}
+
+        self.model.clear()
+        self.model.set_states(['A'])
+        self.model.add_update(update, {'model': self.model}, get_nodes=True)
+        self.model.add_property_function(PropertyFunction('ones', count, 1, {'model': self.model}, incremental=True))
+        self.model.simulate(3, show_tqdm=False)
+        self.assertEqual(calls, [None, [1], [2]])
+        self.assertEqual(list(self.model.get_properties()['ones']), [1, 2, 3])
+
+        self.model.remove_edges([0], [1])
+        self.model.simulate(1, show_tqdm=False)
+        self.assertEqual(calls[-1], None)
+        self.assertEqual(list(self.model.get_properties()['ones']), [1, 2, 3, 4])
+
+    def test_written_nodes(self):
+        calls = []
+
+        def changed_nodes(previous, changed):
+            calls.append(None if changed is None else list(changed))
+            return 0
+
+        # Writing an unchanged value is reported as well
+        self.model.add_update(lambda nodes: {'A': ([3], np.zeros(1))}, get_nodes=True)
+        self.model.add_property_function(PropertyFunction('changed', changed_nodes, 1, {}, incremental=True))
+        self.model.simulate(2, show_tqdm=False)
+        self.model.get_properties()
+        self.assertEqual(calls, [None, [0, 3]])
+
+        self.model.property_functions[0].states_changed([1])
+        self.model.simulate(1, show_tqdm=False)
+        self.assertEqual(calls[-1], [0, 1, 3])
+
+    def test_sampled(self):
+        prop = PropertyFunction('clustering', nx.average_clustering, 1, {'G': nx.complete_graph(100)}, error=0.2)
+        self.assertEqual(prop.samples, sample_size(0.2))
+        self.assertEqual(prop.samples, 47)
+
+        model = Model(nx.complete_graph(100))
+        model.set_states(['A'])
+        prop.params = {'G': model.graph}
+        model.add_property_function(prop)
+        model.add_property_function(PropertyFunction('nodes', lambda nodes: len(set(nodes)), 1, {}, samples=10))
+        with mock.patch.object(Model, 'nodes', new_callable=mock.PropertyMock) as nodes:
+            model.simulate(2, show_tqdm=False)
+            self.assertFalse(nodes.called)
+        self.assertEqual(list(model.get_properties()['clustering']), [1, 1])
+        self.assertEqual(list(model.get_properties()['nodes']), [10, 10])
+
+    def test_objects(self):
+        prop = PropertyFunction('degrees', lambda model: dict(model.graph.degree), 1, {'model': self.model})
+        self.model.add_property_function(prop)
+        clone = self.model.clone()
+        clone.simulate(2, show_tqdm=False)
+        self.assertEqual(clone.get_properties()['degrees'].dtype, object)
+        self.assertEqual(clone.get_properties()['degrees'][1], {0: 1, 1: 2, 2: 2, 3: 1})
+        self.assertEqual(len(prop.get_values()), 0)
+
+    def test_varying_results(self):
+        results = iter([1, 2.5, [1, 2], None])
+        prop = PropertyFunction('varying', lambda: next(results), 1, {})
+        self.model.add_property_function(prop)
+        self.model.simulate(2, show_tqdm=False)
+        self.assertEqual(list(prop.get_values()), [1, 2.5])
+        self.model.simulate(2, show_tqdm=False)
+        self.assertEqual(prop.get_values().dtype, object)
+        self.assertEqual(list(prop.get_values()), [1, 2.5, [1, 2], None])
@@ -0,0 +1,106 @@
+import unittest
+
+from nsimf.models.Model import Model
+from nsimf.models.SA import SensitivityAnalysis
+from nsimf.models.SA import SAConfiguration
+
+import networkx as nx
+import numpy as np
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+def create_model():
+    model = Model(nx.path_graph(10))
+    model.constants = {'a': 0.5, 'b': 0.5}
+    model.set_states(['A'])
+
+    def update(model, constants):
+        noise = np.random.random(10) * constants['b']
+        return {'A': model.get_state('A') + constants['a'] + noise}
+
+    model.add_update(update, {'model': model, 'constants': model.constants})
+    return model
+
+
+def create_closure_model():
+    model = Model(nx.path_graph(10))
+    model.constants = {'a': 0.5, 'b': 0.5}
+    model.set_states(['A'])
+
+    def update():
+        return {'A': model.get_state('A') + model.constants['a']}
+
+    model.add_update(update)
+    return model
+
+
+class SensitivityAnalysisTest(unittest.TestCase):
+    def get_configuration(self, processes):
+        return SAConfiguration({
+            'bounds': {'a': (0, 1), 'b': (0, 1)},
+            'iterations': 5,
+            'initial_state': {'A': 0},
+            'initial_args': {},
+            'n': 2,
+            'second_order': False,
+            'algorithm_input': 'states',
+            'algorithm': 'mean',
+            'output_type': '',
+            'algorithm_args': {},
+            'processes': processes,
+            'chunksize': 2,
+            'seed': 1337
+        })
+
+    def test_parallel_matches_serial(self):
+        serial = SensitivityAnalysis(self.get_configuration(1), create_model())
+        parallel = SensitivityAnalysis(self.get_configuration(2), create_model())
+        problem, param_values = serial.get_saltelli_params()
+
+        serial_outputs = serial.run_models(param_values, problem['names'])
+        parallel_outputs = parallel.run_models(param_values, problem['names'])
+
+        self.assertEqual(len(serial_outputs['A']), len(param_values))
+        self.assertTrue(np.array_equal(serial_outputs['A'], parallel_outputs['A']))
+
+    def test_unseeded_workers(self):
+        cfg = self.get_configuration(4)
+        cfg.seed = None
+        cfg.chunksize = 1
+        sa = SensitivityAnalysis(cfg, create_model())
+        # Near constant parameters, so the outputs only differ by their noise
+        param_values = np.tile([0.5, 1.], (8, 1))
+        outputs = sa.run_models(param_values, ['a', 'b'])
+        self.assertEqual(len(np.unique(outputs['A'])), 8)
+
+    def test_custom_reduce(self):
+        cfg = self.get_configuration(1)
+        cfg.algorithm = lambda output: output.shape[0]
+        cfg.output_type = 'reduce'
+        sa = SensitivityAnalysis(cfg, create_model())
+        problem, param_values = sa.get_saltelli_params()
+        outputs = sa.run_models(param_values, problem['names'])
+        self.assertEqual(list(outputs), [5] * len(param_values))
+
+    def test_closure_update(self):
+        for processes in [1, 2]:
+            cfg = self.get_configuration(processes)
+            cfg.initial_args = None
+            model = create_closure_model()
+            sa = SensitivityAnalysis(cfg, model)
+            self.assertTrue(sa.in_place())
+            problem, param_values = sa.get_saltelli_params()
+            outputs = sa.run_models(param_values, problem['names'])
+            self.assertTrue(np.allclose(outputs['A'], 5 * param_values[:, 0]))
+            self.assertEqual(model.config.state_memory, 0)
+
+    def test_parse(self):
+        sa = SensitivityAnalysis(self.get_configuration(1), create_model())
+        outputs = [np.full((2, 10, 1), i, dtype=float) for i in range(3)]
+        self.assertEqual(list(sa.parse(outputs)['A']), [0, 1, 2])
+        sa.config.algorithm = lambda output: output.sum()
+        sa.config.output_type = 'reduce'
+        self.assertEqual(list(sa.custom_reduce(outputs)), [0, 20, 40])
+        self.assertEqual(list(sa.get_state_dict()), ['A'])
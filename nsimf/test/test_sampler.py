@@ -0,0 +1,105 @@
+import unittest
+
+from nsimf.models.Model import Model
+from nsimf.models.FenwickTree import FenwickTree
+from nsimf.models.Kernel import KernelUpdate
+from nsimf.models.Sampler import UniformSampler
+from nsimf.models.Sampler import BernoulliSampler
+from nsimf.models.Sampler import WeightedSampler
+from nsimf.models.Scheme import Scheme
+from nsimf.models.Update import Update
+
+import networkx as nx
+import numpy as np
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+def increase_x(nodes, states, new_states, indptr, indices, constants):
+    for node in nodes:
+        new_states[node, 1] = states[node, 1] + 1
+
+
+class SamplerTest(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(1337)
+        self.model = Model(nx.empty_graph(100))
+        self.model.set_states(['w'])
+
+    def test_fenwick_tree(self):
+        tree = FenwickTree([1, 0, 2, 3])
+        self.assertEqual(tree.total, 6)
+        self.assertEqual(tree.prefix_sum(2), 3)
+        self.assertEqual([tree.find(v) for v in [0, 0.99, 1, 2.99, 3, 5.99]], [0, 0, 2, 2, 3, 3])
+        tree.update(1, 4)
+        self.assertEqual(tree.total, 10)
+        self.assertEqual(tree.find(1), 1)
+        self.assertEqual(tree.prefix_sum(3), 10)
+
+    def test_uniform_sampler(self):
+        nodes = UniformSampler(self.model, 10)()
+        self.assertEqual(len(np.unique(nodes)), 10)
+        self.assertEqual(len(UniformSampler(self.model, 200)()), 100)
+
+    def test_bernoulli_sampler(self):
+        nodes = BernoulliSampler(self.model, 0.3)()
+        self.assertTrue(np.all(np.diff(nodes) > 0))
+        self.assertTrue(np.all(nodes < 100))
+        self.assertTrue(10 < len(nodes) < 50)
+        self.assertEqual(len(BernoulliSampler(self.model, 1)()), 100)
+
+    def test_weighted_sampler(self):
+        self.model.set_initial_state({'w': 0})
+        self.model.node_states[7, 0] = 1
+        sampler = WeightedSampler(self.model, 'w')
+        self.assertEqual(list(sampler()), [7])
+
+        self.model.node_states[7, 0] = 0
+        self.model.node_states[42, 0] = 2
+        sampler.update([7, 42])
+        self.assertEqual(list(sampler()), [42])
+        self.assertEqual(sampler.tree.total, 2)
+
+        self.model.node_states[3, 0] = 2
+        sampler.update([3])
+        sampler.size = 2
+        self.assertEqual(sorted(sampler()), [3, 42])
+        self.assertEqual(sampler.tree.weights[3], 2)
+
+    def test_weighted_sampler_writes(self):
+        self.model.set_initial_state({'w': 1})
+        sampler = WeightedSampler(self.model, 'w')
+
+        def update(nodes):
+            return {'w': ([2, 5], np.array([3., 4.]))}
+
+        self.model.add_scheme(Scheme(sampler, updates=[Update(update, get_nodes=True)]))
+        self.model.iteration()
+        tree = sampler.tree
+        updated = []
+        tree_update = tree.update
+        tree.update = lambda node, weight: (updated.append(node), tree_update(node, weight))
+        tree.build = None
+        self.model.iteration()
+
+        self.assertIs(sampler.tree, tree)
+        self.assertEqual(updated, [2, 5])
+        self.assertTrue(np.array_equal(tree.weights, self.model.get_state('w')))
+
+    def test_weighted_sampler_kernel_writes(self):
+        self.model.set_states(['w', 'x'])
+        self.model.set_initial_state({'w': 1})
+        sampler = WeightedSampler(self.model, 'w')
+        self.model.add_scheme(Scheme(sampler, updates=[KernelUpdate(increase_x, jit=False, writes=['x'])]))
+        self.model.iteration()
+        tree = sampler.tree
+        tree.build = None
+        self.model.iteration()
+        self.assertIs(sampler.tree, tree)
+        self.assertEqual(self.model.get_state('x').sum(), 2)
+
+        # Kernels without declared writes may write every state
+        self.model.add_kernel(increase_x, jit=False)
+        self.model.iteration()
+        self.assertIsNot(sampler.tree, tree)
@@ -0,0 +1,63 @@
+import multiprocessing as mp
+import unittest
+
+from nsimf.models.Model import Model
+from nsimf.models.Model import ModelConfiguration
+from nsimf.models.SharedStates import SharedStatesReader
+
+import networkx as nx
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+def read_states(handle, queue):
+    reader = SharedStatesReader(handle)
+    queue.put((reader.iteration, reader.get_state('A').tolist(), reader.get_history()[:, 0, 0].tolist(),
+               reader.node_states.flags.writeable))
+    reader.close()
+
+
+class SharedStatesTest(unittest.TestCase):
+    def setUp(self):
+        self.model = Model(nx.path_graph(3), ModelConfiguration({'shared_memory': True}))
+        self.model.set_states(['A', 'B'])
+        self.model.add_update(lambda: {'A': self.model.get_state('A') + 1})
+
+    def tearDown(self):
+        self.model.release_shared_memory()
+
+    def test_reader(self):
+        handle = self.model.get_shared_handle()
+        self.model.simulate(3, show_tqdm=False)
+
+        reader = SharedStatesReader(handle)
+        self.assertEqual(reader.iteration, 3)
+        self.assertEqual(list(reader.get_state('A')), [3, 3, 3])
+        self.assertEqual(list(reader.get_history()[:, 0, 0]), [1, 2, 3])
+
+        self.model.simulate(1, show_tqdm=False)
+        self.assertEqual(list(reader.get_history()[:, 0, 0]), [4])
+        self.assertFalse(reader.node_states.flags.writeable)
+        reader.close()
+
+    def test_other_process(self):
+        context = mp.get_context('spawn')
+        queue = context.Queue()
+        self.model.simulate(2, show_tqdm=False)
+        process = context.Process(target=read_states, args=(self.model.get_shared_handle(), queue))
+        process.start()
+        result = queue.get(timeout=60)
+        process.join()
+
+        self.assertEqual(result, (2, [2, 2, 2], [1, 2], False))
+        # The reader exiting does not free the shared memory
+        self.assertEqual(list(SharedStatesReader(self.model.get_shared_handle()).get_state('A')), [2, 2, 2])
+
+    def test_release(self):
+        self.model.simulate(2, show_tqdm=False)
+        self.model.release_shared_memory()
+        self.assertIsNone(self.model.shared)
+        self.assertEqual(list(self.model.simulate(1, show_tqdm=False)[:, 0, 0]), [3])
+        with self.assertRaises(ValueError):
+            self.model.get_shared_handle()
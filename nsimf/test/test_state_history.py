@@ -0,0 +1,37 @@
+import unittest
+
+from nsimf.models.StateHistory import StateHistory
+
+import numpy as np
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+class StateHistoryTest(unittest.TestCase):
+    def test_append(self):
+        h = StateHistory(3, (2, 1))
+        h.append(np.zeros((2, 1)))
+        h.append(np.ones((2, 1)))
+        self.assertEqual(len(h), 2)
+        self.assertEqual(h.to_array().shape, (2, 2, 1))
+        self.assertTrue(np.shares_memory(h.to_array(), h.buffer))
+
+    def test_sliding_window(self):
+        h = StateHistory(3, (2,))
+        for i in range(5):
+            h.append(np.full(2, i))
+        self.assertEqual(len(h), 3)
+        self.assertEqual(list(h.to_array()[:, 0]), [2, 3, 4])
+        self.assertEqual(h.get_previous(0)[0], 4)
+        self.assertEqual(h.get_previous(2)[0], 2)
+        self.assertEqual(h[0][0], 2)
+        self.assertTrue(np.shares_memory(h[-1], h.buffer))
+        with self.assertRaises(IndexError):
+            h.get_previous(3)
+
+    def test_empty(self):
+        h = StateHistory(0, (2,))
+        h.append(np.ones(2))
+        self.assertEqual(len(h), 0)
+        self.assertEqual(h.to_array().shape, (0, 2))
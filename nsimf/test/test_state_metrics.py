@@ -0,0 +1,55 @@
+import unittest
+
+from nsimf.models.Model import Model
+from nsimf.models.StateMetrics import StateMetrics
+
+import networkx as nx
+import numpy as np
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+class StateMetricsTest(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(1)
+        self.graph = nx.erdos_renyi_graph(50, 0.1, seed=1)
+        self.model = Model(self.graph)
+        self.model.set_states(['A', 'B'])
+        self.model.node_states[:] = np.random.random((50, 2))
+        self.metrics = StateMetrics()
+
+    def test_moments(self):
+        states = self.model.node_states
+        self.assertAlmostEqual(self.metrics.mean(self.model, 'B'), states[:, 1].mean())
+        self.assertAlmostEqual(self.metrics.variance(self.model, 'B'), states[:, 1].var())
+        self.assertAlmostEqual(self.metrics.max(self.model, 'A'), states[:, 0].max())
+        self.assertTrue(np.allclose(self.metrics.quantiles(self.model, 'A', [0, 0.3, 0.5, 1]),
+                                    np.quantile(states[:, 0], [0, 0.3, 0.5, 1])))
+        self.assertTrue(np.array_equal(self.metrics.histogram(self.model, 'A', 5, (0.2, 1)),
+                                       np.histogram(states[:, 0], 5, (0.2, 1))[0]))
+        differences = np.abs(states[:, None, 1] - states[None, :, 1])
+        self.assertAlmostEqual(self.metrics.polarization(self.model, 'B'), differences.sum() / (50 * 49))
+
+    def test_neighbors(self):
+        states = self.model.node_states
+        edges = np.array(self.graph.edges)
+        differences = states[edges[:, 0], 0] - states[edges[:, 1], 0]
+        self.assertAlmostEqual(self.metrics.disagreement(self.model, 'A'), np.mean(differences ** 2))
+
+        nx.set_node_attributes(self.graph, dict(enumerate(states[:, 1])), 'B')
+        self.assertAlmostEqual(self.metrics.assortativity(self.model, 'B'),
+                               nx.numeric_assortativity_coefficient(self.graph, 'B'))
+
+    def test_property(self):
+        def update(model):
+            return {'A': np.full(50, model.current_iteration + 1.)}
+
+        self.model.add_update(update, {'model': self.model})
+        self.model.add_property_function(self.metrics.property(self.model, 'mean', 'A'))
+        self.model.add_property_function(self.metrics.property(self.model, 'quantiles', 'A', 'q', q=[0.5, 1]))
+        clone = self.model.clone()
+        clone.simulate(3, show_tqdm=False)
+        self.assertEqual(list(clone.get_properties()['mean_A']), [1, 2, 3])
+        self.assertEqual(clone.get_properties()['q'].tolist(), [[1, 1], [2, 2], [3, 3]])
+        self.assertEqual(len(self.model.get_properties()), 0)
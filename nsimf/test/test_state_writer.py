@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from nsimf.models.EventScheduler import EventScheduler
+from nsimf.models.Model import Model
+from nsimf.models.Model import ModelConfiguration
+from nsimf.models.StateWriter import StateWriter
+from nsimf.models.StateWriter import AsyncStateWriter
+from nsimf.models.Update import Update
+from nsimf.models.Visualizer import Visualizer
+
+import networkx as nx
+import numpy as np
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+class StateWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'out.npy')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_write_read(self):
+        writer = StateWriter(self.path, (2, 3, 1))
+        writer.write(np.zeros((3, 1)))
+        writer.write(np.ones((3, 1)))
+        writer.close()
+        self.assertTrue(StateWriter.is_binary(self.path))
+        states = Visualizer.read_states_from_file(self.path)
+        self.assertIsInstance(states, np.memmap)
+        self.assertEqual(states.shape, (2, 3, 1))
+        self.assertEqual(states[1, 2, 0], 1)
+
+    def test_model_save_disk(self):
+        cfg = ModelConfiguration({'save_disk': True, 'path': self.path, 'save_interval': 2})
+        m = Model(nx.path_graph(4), cfg)
+        m.set_states(['A'])
+        m.add_update(lambda: {'A': m.get_state('A') + 1})
+        m.simulate(5, show_tqdm=False)
+        states = StateWriter.read(self.path)
+        self.assertEqual(states.shape, (2, 4, 1))
+        self.assertEqual(list(states[:, 0, 0]), [2, 4])
+
+    def test_async_writer(self):
+        writer = AsyncStateWriter(StateWriter(self.path, (10, 3, 2)), queue_size=2)
+        for i in range(10):
+            writer.write(np.full((3, 2), i))
+        writer.close()
+        states = StateWriter.read(self.path)
+        self.assertEqual(list(states[:, 0, 0]), list(range(10)))
+
+    def test_async_writer_error(self):
+        writer = AsyncStateWriter(StateWriter(self.path, (1, 3, 2)))
+        writer.write(np.zeros((3, 2)))
+        writer.write(np.zeros((3, 2)))
+        with self.assertRaises(IndexError):
+            writer.close()
+
+    def test_model_async_io(self):
+        cfg = ModelConfiguration({'save_disk': True, 'path': self.path, 'save_interval': 1, 'async_io': True})
+        m = Model(nx.path_graph(4), cfg)
+        m.set_states(['A'])
+        m.add_update(lambda: {'A': m.get_state('A') + 1})
+        m.simulate(20, show_tqdm=False)
+        states = StateWriter.read(self.path)
+        self.assertEqual(list(states[:, 3, 0]), list(range(1, 21)))
+
+    def test_simulation_error(self):
+        cfg = ModelConfiguration({'save_disk': True, 'path': self.path, 'save_interval': 1, 'async_io': True})
+        m = Model(nx.path_graph(4), cfg)
+        m.set_states(['A'])
+        m.add_update(lambda: {'A': m.get_state('A') + 1 / (1 - m.current_iteration)})
+        with mock.patch.object(StateWriter, 'write', side_effect=IOError('Disk full')):
+            with self.assertRaises(ZeroDivisionError):
+                m.simulate(5, show_tqdm=False)
+
+    def test_scheduler_error(self):
+        cfg = ModelConfiguration({'save_disk': True, 'path': self.path, 'save_interval': 1})
+        m = Model(nx.path_graph(4), cfg)
+        m.set_states(['A'])
+        scheduler = EventScheduler(m)
+        scheduler.add_node_event(Update(lambda nodes: {'A': [1 / (2 - m.current_iteration)]}, get_nodes=True), 1)
+        # Closing the file fails as well
+        with mock.patch.object(StateWriter, 'flush', side_effect=IOError('Disk full')):
+            with self.assertRaises(ZeroDivisionError):
+                scheduler.simulate(100, 0.01, show_tqdm=False)
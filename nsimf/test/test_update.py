@@ -9,7 +9,7 @@ __email__ = "m.f.maijer@gmail.com"
 class UpdateTest(unittest.TestCase):
     def test_init(self):
         u = Update(lambda x: x, {}, None, False)
-        self.assertEqual(len(u.__dict__.keys()), 4)
+        self.assertEqual(len(u.__dict__.keys()), 6)
 
     def test_execute(self):
         u = Update(lambda x: x, {'x': [1, 2, 3]}, None, False)
@@ -17,3 +17,11 @@ class UpdateTest(unittest.TestCase):
 
         u = Update(lambda x, y: x + y, {'y': [3, 4, 5]}, None, True)
         self.assertEqual(u.execute([1, 2]), [1, 2, 3, 4, 5])
+
+    def test_independent(self):
+        a = Update(lambda: {}, reads=['B'], writes=['A'])
+        b = Update(lambda: {}, reads=['A'], writes=['B'])
+        self.assertTrue(a.is_independent(b, ['A', 'B']))
+        self.assertFalse(a.is_independent(b))
+        self.assertFalse(a.is_independent(Update(lambda: {}, reads=[], writes=['A']), ['A', 'B']))
+        self.assertFalse(a.is_independent(Update(lambda: {}), ['A', 'B']))
@@ -0,0 +1,59 @@
+import unittest
+
+from nsimf.models.Model import Model
+from nsimf.models.Model import ModelConfiguration
+from nsimf.models.Scheme import Scheme
+from nsimf.models.Update import Update
+from nsimf.models.UpdatePlan import dict_to_sparse
+
+import networkx as nx
+import numpy as np
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+class UpdatePlanTest(unittest.TestCase):
+    def setUp(self):
+        self.model = Model(nx.path_graph(5))
+        self.model.set_states(['A', 'B'])
+
+    def test_sparse_outputs(self):
+        def update(nodes):
+            return {'A': (np.array([1, 3]), np.array([2., 4.])), 'B': {0: 1, 4: 5}}
+
+        self.model.add_update(update, get_nodes=True)
+        self.model.simulate(1, show_tqdm=False)
+        self.assertEqual(list(self.model.get_state('A')), [0, 2, 0, 4, 0])
+        self.assertEqual(list(self.model.get_state('B')), [1, 0, 0, 0, 5])
+        self.assertIn('A: write_sparse', str(self.model.plan))
+        self.assertIn('B: write_dict', str(self.model.plan))
+
+    def test_batched_outputs(self):
+        def update(nodes):
+            return {'A': nodes * 2, 'B': [7, 8]}
+
+        self.model.add_scheme(Scheme(lambda: np.array([1, 2]), updates=[Update(update, get_nodes=True)]))
+        self.model.simulate(1, show_tqdm=False)
+        self.assertEqual(list(self.model.get_state('A')), [0, 2, 4, 0, 0])
+        self.assertEqual(list(self.model.get_state('B')), [0, 7, 8, 0, 0])
+
+    def test_dict_to_sparse(self):
+        indices, values = dict_to_sparse({2: np.array([1, 2, 3]), 0: np.array([4, 5, 6])})
+        self.assertEqual(list(indices), [2, 0])
+        self.assertEqual(values.shape, (3, 2))
+
+    def test_parallel_groups(self):
+        model = Model(nx.path_graph(4), ModelConfiguration({'update_threads': 2}))
+        model.set_states(['A', 'B', 'C'])
+        model.add_update(lambda: {'A': model.get_state('C') + 1}, reads=['C'], writes=['A'])
+        model.add_update(lambda: {'B': model.get_state('C') + 2}, reads=['C'], writes=['B'])
+        model.add_update(lambda: {'C': model.get_state('A') + 3}, reads=['A'], writes=['C'])
+        model.add_update(lambda: {'A': model.get_state('A') * 2})
+        model.add_update(lambda: {}, reads=[], writes=['utility'])
+        model.add_update(lambda: {}, reads=['utility'], writes=[])
+        model.simulate(2, show_tqdm=False)
+
+        self.assertEqual([len(group) for group in model.plan.schemes[0].groups], [3, 1, 1, 1])
+        self.assertIn('Parallel group', str(model.plan))
+        self.assertEqual(list(model.node_states[0]), [0, 5, 3])
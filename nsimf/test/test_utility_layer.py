@@ -0,0 +1,87 @@
+import unittest
+
+from nsimf.models.Model import Model
+from nsimf.models.UtilityLayer import UtilityLayer
+from nsimf.models.NeighborIndex import NeighborIndex
+from nsimf.models.conditions.Condition import ConditionType
+from nsimf.models.conditions.ThresholdCondition import ThresholdCondition
+from nsimf.models.conditions.ThresholdCondition import ThresholdConfiguration
+from nsimf.models.conditions.ThresholdCondition import ThresholdOperator
+
+import networkx as nx
+import numpy as np
+
+__author__ = "Mathijs Maijer"
+__email__ = "m.f.maijer@gmail.com"
+
+
+class UtilityLayerTest(unittest.TestCase):
+    def setUp(self):
+        self.graph = nx.star_graph(3)
+        self.layer = UtilityLayer(NeighborIndex(nx.to_scipy_sparse_array(self.graph)))
+
+    def test_initialization(self):
+        self.assertEqual(len(self.layer.get_utility()), 6)
+        self.layer.set_utility(lambda sources, targets: sources + targets)
+        self.assertEqual(list(self.layer.get_utility()), [1, 2, 3, 1, 2, 3])
+
+        matrix = np.arange(16.).reshape(4, 4)
+        self.layer.set_utility(matrix)
+        self.assertEqual(list(self.layer.get_utility()), [1, 2, 3, 4, 8, 12])
+        self.assertTrue(np.array_equal(self.layer.matrix.toarray(), matrix * (nx.to_numpy_array(self.graph) != 0)))
+
+    def test_edges(self):
+        self.layer.set_edges_utility([0, 2], [1, 0], [5, 6])
+        self.layer.add_edges_utility([0, 0], [1, 1], [1, 1])
+        self.assertEqual(list(self.layer.get_edges_utility([0, 2], [1, 0])), [7, 6])
+        self.assertEqual(list(self.layer.sum()), [7, 0, 6, 0])
+        self.assertEqual(list(self.layer.mean()), [7 / 3, 0, 6, 0])
+        self.assertEqual(list(self.layer.get_nodes_utility([2])[0]), [6])
+        with self.assertRaises(ValueError):
+            self.layer.set_edges_utility([1], [2], [1])
+
+    def test_model_utility(self):
+        m = Model(self.graph)
+        m.set_states(['A'])
+        m.add_utility_layer(1)
+        cfg = ThresholdConfiguration(ThresholdOperator.GE, 2)
+
+        def update(nodes, utility):
+            utility.add_edges_utility([0, 0, 0], [1, 2, 3], 1)
+            return {'A': np.ones(len(nodes))}
+
+        m.add_update(update, {'utility': m.get_utility_layer()},
+                     condition=ThresholdCondition(ConditionType.UTILITY, cfg), get_nodes=True)
+        clone = m.clone()
+        clone.simulate(1, show_tqdm=False)
+
+        self.assertEqual(list(clone.get_state('A')), [1, 0, 0, 0])
+        # The graph is undirected, so the writes are mirrored to the reverse edges
+        self.assertEqual(list(clone.get_utility_layer().get_utility()), [2] * 6)
+        self.assertEqual(list(m.get_utility_layer().get_utility()), [1] * 6)
+
+    def test_undirected(self):
+        graph = nx.path_graph(3)
+        graph.add_edge(1, 1)
+        layer = UtilityLayer(NeighborIndex(nx.to_scipy_sparse_array(graph)), directed=False)
+        layer.set_utility(lambda sources, targets: sources - targets)
+        self.assertTrue(np.array_equal(layer.matrix.toarray(), layer.matrix.toarray().T))
+        self.assertEqual(list(layer.get_edges_utility([0, 1], [1, 0])), [-1, -1])
+
+        layer.set_edges_utility([2], [1], [5])
+        layer.add_edges_utility([1, 0, 1], [2, 1, 1], 1)
+        self.assertEqual(list(layer.get_edges_utility([1, 2, 0, 1, 1], [2, 1, 1, 0, 1])), [6, 6, 0, 0, 1])
+
+    def test_realign(self):
+        m = Model(nx.path_graph(4))
+        m.set_states(['A'])
+        layer = m.add_utility_layer(lambda sources, targets: sources + targets)
+        m.remove_edges([0], [1])
+        m.add_edges([0], [3])
+        m.apply_mutations()
+
+        self.assertIs(m.get_utility_layer(), layer)
+        self.assertFalse(layer.directed)
+        self.assertEqual(list(layer.get_edges_utility([1, 2, 0, 3], [2, 3, 3, 0])), [3, 5, 0, 0])
+        layer.set_edges_utility([3], [0], [2])
+        self.assertEqual(list(layer.get_edges_utility([0], [3])), [2])
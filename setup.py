@@ -36,5 +36,6 @@ setup(name='nsimf',
       long_description=long_description,
       long_description_content_type='text/markdown',
       packages=find_packages(exclude=["*.test", "*.test.*", "test.*", "test", "nsimf.test", "nsimf.test.*"]),
-      install_requires=['numpy', 'networkx', 'tqdm', 'pyintergraph', 'python-igraph', 'pillow', 'sphinx-rtd-theme', 'pytest', 'salib'],
+      install_requires=['numpy', 'scipy', 'networkx', 'tqdm', 'pyintergraph', 'python-igraph', 'pillow', 'sphinx-rtd-theme', 'pytest', 'salib'],
+      extras_require={'numba': ['numba']},
       )